@@ -6,4 +6,14 @@ mqtt_client_id = 'picow'
 
 # Wifi
 wifi_ssid = 'wifi-network'
-wifi_pass = 'hunter3'
\ No newline at end of file
+wifi_pass = 'hunter3'
+# Static IP (Optional), as (ip, subnet, gateway, dns), to skip DHCP for a faster connection
+# wifi_ifconfig = ('192.168.1.50', '255.255.255.0', '192.168.1.1', '192.168.1.1')
+# Re-use the last DHCP lease (Optional). Only use this where the device has a DHCP reservation.
+# wifi_reuse_lease = True
+
+# Sensor calibration (Optional)
+# Offset & gain adjustments for sensor readings, by sensor id, applied as `reading * gain + offset`
+calibration = {
+    'picow_a_temp': {'offset': -5.0},
+}
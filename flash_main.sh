@@ -1,3 +0,0 @@
-#!/bin/bash
-
-rshell --buffer-size=512 --quiet "cp $1 /pyboard/main.py; repl ~ import machine ~ machine.reset() ~"
\ No newline at end of file
@@ -0,0 +1,42 @@
+import machine
+import utime
+from libraries.hd44780 import HD44780
+from libraries.hd44780_pio import HD44780PIO
+
+# Measures the throughput of writes to the display, in characters per second.
+# Uses the same wiring as lcd_display.py
+
+lcd_rs = machine.Pin(6, machine.Pin.OUT)
+lcd_enable = machine.Pin(7, machine.Pin.OUT)
+lcd_data4 = machine.Pin(8, machine.Pin.OUT)
+lcd_data5 = machine.Pin(9, machine.Pin.OUT)
+lcd_data6 = machine.Pin(10, machine.Pin.OUT)
+lcd_data7 = machine.Pin(11, machine.Pin.OUT)
+
+
+def benchmark(lcd, name, frames, chars_per_frame, clear=False):
+    start = utime.ticks_us()
+    for i in range(100):
+        lcd.write(frames[i % len(frames)], clear)
+    taken_us = utime.ticks_diff(utime.ticks_us(), start)
+    chars_per_sec = (100 * chars_per_frame * 1000000) / taken_us
+    print("{}: {:.0f} chars/sec, {:.2f}ms per frame".format(name, chars_per_sec, taken_us / 100000))
+
+
+def benchmark_all(lcd, backend):
+    print("Backend:", backend)
+
+    # Every character changes on each write
+    benchmark(lcd, "Full screen", ["A" * 16 + "\n" + "B" * 16, "C" * 16 + "\n" + "D" * 16], 32)
+
+    # Every character written after a clear on each write
+    benchmark(lcd, "Full screen with clear", ["A" * 16 + "\n" + "B" * 16, "C" * 16 + "\n" + "D" * 16], 32, True)
+
+    # Just the last digit changes on each write
+    benchmark(lcd, "Partial update", ["CO2 {}ppm".format(n) for n in range(800, 810)], 1)
+
+
+benchmark_all(HD44780(lcd_rs, lcd_enable, lcd_data4, lcd_data5, lcd_data6, lcd_data7), "Pins")
+
+# Data pins 8-11 are consecutive, so can be driven via PIO
+benchmark_all(HD44780PIO(lcd_rs, lcd_enable, lcd_data4, lcd_data5, lcd_data6, lcd_data7), "PIO")
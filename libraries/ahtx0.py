@@ -29,7 +29,9 @@ Author(s): Andreas Bühl, Kattni Rembor
 """
 
 import utime
+import uasyncio as asyncio
 from micropython import const
+from libraries.crc8 import crc8
 
 
 class AHT10:
@@ -41,22 +43,34 @@ class AHT10:
     AHTX0_CMD_SOFTRESET = const(0xBA)  # Soft reset command
     AHTX0_STATUS_BUSY = const(0x80)  # Status bit for busy
     AHTX0_STATUS_CALIBRATED = const(0x08)  # Status bit for calibrated
+    AHTX0_MEASUREMENT_MAX_AGE_MS = const(500)  # Time a measurement is shared between readers
+    AHTX0_CONVERSION_MS = const(80)  # Measurement conversion time, as per datasheet
+    AHTX0_MEASUREMENT_ATTEMPTS = const(3)  # Attempts made to get a measurement that passes CRC checks
+    AHTX0_FRAME_LENGTH = 6  # Status byte + 5 data bytes
+    AHTX0_HAS_CRC = False
 
     def __init__(self, i2c, address=AHTX0_I2CADDR_DEFAULT):
         utime.sleep_ms(20)  # 20ms delay to wake up
         self._i2c = i2c
         self._address = address
-        self._buf = bytearray(6)
+        self._buf = bytearray(self.AHTX0_FRAME_LENGTH)
+        # Command windows onto the buffer, to avoid a slice allocation per command
+        buf_view = memoryview(self._buf)
+        self._cmd1 = buf_view[0:1]
+        self._cmd3 = buf_view[0:3]
+        self.crc_errors = 0
         self.reset()
         if not self.initialize():
             raise RuntimeError("Could not initialize")
-        self._temp = None
-        self._humidity = None
+        self._temp = 0  # Raw 20-bit reading
+        self._humidity = 0  # Raw 20-bit reading
+        self._measured_at = None
+        self._lock = asyncio.Lock()
 
     def reset(self):
         """Perform a soft-reset of the AHT"""
         self._buf[0] = self.AHTX0_CMD_SOFTRESET
-        self._i2c.writeto(self._address, self._buf[0:1])
+        self._i2c.writeto(self._address, self._cmd1)
         utime.sleep_ms(20)  # 20ms delay to wake up
 
     def initialize(self):
@@ -64,7 +78,7 @@ class AHT10:
         self._buf[0] = self.AHTX0_CMD_INITIALIZE
         self._buf[1] = 0x08
         self._buf[2] = 0x00
-        self._i2c.writeto(self._address, self._buf[0:3])
+        self._i2c.writeto(self._address, self._cmd3)
         self._wait_for_idle()
         if not self.status & self.AHTX0_STATUS_CALIBRATED:
             return False
@@ -79,20 +93,93 @@ class AHT10:
     @property
     def relative_humidity(self):
         """The measured relative humidity in percent."""
-        self._perform_measurement()
-        self._humidity = (
-            (self._buf[1] << 12) | (self._buf[2] << 4) | (self._buf[3] >> 4)
-        )
-        self._humidity = (self._humidity * 100) / 0x100000
-        return self._humidity
+        self.update()
+        return (self._humidity * 100) / 0x100000
 
     @property
     def temperature(self):
         """The measured temperature in degrees Celcius."""
-        self._perform_measurement()
+        self.update()
+        return ((self._temp * 200.0) / 0x100000) - 50
+
+    def measure(self, max_age_ms=AHTX0_MEASUREMENT_MAX_AGE_MS):
+        """
+        Get both the temperature and relative humidity, as a (temperature, humidity) tuple,
+        from a single measurement.
+        A measurement taken within the last max_age_ms will be re-used instead of triggering
+        a new one, so multiple readers in the same poll cycle share one bus transaction.
+        """
+        self.update(max_age_ms)
+        return self._converted_readings()
+
+    async def measure_async(self, max_age_ms=AHTX0_MEASUREMENT_MAX_AGE_MS):
+        """Awaitable version of measure(), taking the measurement via update_async()"""
+        await self.update_async(max_age_ms)
+        return self._converted_readings()
+
+    def update(self, max_age_ms=AHTX0_MEASUREMENT_MAX_AGE_MS):
+        """
+        Take a measurement, unless one was taken within the last max_age_ms, without returning the readings.
+        Along with reading the temperature & relative_humidity properties, this avoids building the
+        tuple measure() returns, so only the floats requested are allocated.
+        """
+        if not self._is_fresh(max_age_ms):
+            for _ in range(self.AHTX0_MEASUREMENT_ATTEMPTS):
+                self._perform_measurement()
+                if self._check_crc():
+                    break
+            else:
+                raise RuntimeError("Measurement failed CRC checks")
+            self._store_measurement()
+
+    async def update_async(self, max_age_ms=AHTX0_MEASUREMENT_MAX_AGE_MS):
+        """
+        Awaitable version of update().
+        Rather than busy-waiting, this yields to the scheduler for the conversion time
+        so other tasks can continue to run while the sensor is measuring.
+        Concurrent callers wait on the same measurement instead of starting their own.
+        """
+        async with self._lock:
+            if not self._is_fresh(max_age_ms):
+                for _ in range(self.AHTX0_MEASUREMENT_ATTEMPTS):
+                    self._trigger_measurement()
+                    await asyncio.sleep_ms(self.AHTX0_CONVERSION_MS)
+                    while self.status & self.AHTX0_STATUS_BUSY:
+                        await asyncio.sleep_ms(5)
+                    self._read_to_buffer()
+                    if self._check_crc():
+                        break
+                else:
+                    raise RuntimeError("Measurement failed CRC checks")
+                self._store_measurement()
+
+    def _is_fresh(self, max_age_ms):
+        """Check if the last measurement was taken within the given max age"""
+        if self._measured_at is None:
+            return False
+        return utime.ticks_diff(utime.ticks_ms(), self._measured_at) < max_age_ms
+
+    def _check_crc(self):
+        """Check the measurement in the buffer against its CRC byte, where the sensor provides one"""
+        if not self.AHTX0_HAS_CRC:
+            return True
+        if crc8(self._buf, 0, 6) == self._buf[6]:
+            return True
+        self.crc_errors += 1
+        return False
+
+    def _store_measurement(self):
+        """
+        Store the measurement data in the buffer as raw integer readings.
+        These are only converted to floats on request, so taking a measurement doesn't allocate.
+        """
+        self._humidity = (self._buf[1] << 12) | (self._buf[2] << 4) | (self._buf[3] >> 4)
         self._temp = ((self._buf[3] & 0xF) << 16) | (self._buf[4] << 8) | self._buf[5]
-        self._temp = ((self._temp * 200.0) / 0x100000) - 50
-        return self._temp
+        self._measured_at = utime.ticks_ms()
+
+    def _converted_readings(self):
+        """Get the stored readings as a (temperature, humidity) tuple in degrees Celcius and percent"""
+        return ((self._temp * 200.0) / 0x100000) - 50, (self._humidity * 100) / 0x100000
 
     def _read_to_buffer(self):
         """Read sensor data to buffer"""
@@ -103,7 +190,7 @@ class AHT10:
         self._buf[0] = self.AHTX0_CMD_TRIGGER
         self._buf[1] = 0x33
         self._buf[2] = 0x00
-        self._i2c.writeto(self._address, self._buf[0:3])
+        self._i2c.writeto(self._address, self._cmd3)
 
     def _wait_for_idle(self):
         """Wait until sensor can receive a new command"""
@@ -119,3 +206,5 @@ class AHT10:
 
 class AHT20(AHT10):
     AHTX0_CMD_INITIALIZE = 0xBE  # Calibration command
+    AHTX0_FRAME_LENGTH = 7  # Status byte + 5 data bytes + CRC byte
+    AHTX0_HAS_CRC = True
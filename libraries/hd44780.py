@@ -7,13 +7,31 @@ https://www.sparkfun.com/datasheets/LCD/HD44780.pdf
 
 Operates in 4-bit mode and therefore only needs to use data pins
 4-7, plus RS + Enable.
+
+A shadow copy of the 16x2 display contents is kept so that writes only send
+the characters which have changed, along with any cursor moves needed to reach them.
+
+Up to 8 custom 5x8 characters can be defined via define_glyph(), and then shown by writing
+characters "\x00" to "\x07". Definitions are cached, so re-defining a glyph with the same
+rows it already has sends nothing to the display.
+
+Each command is given the execution time listed in the datasheet for that command.
+Rather than sleeping for that time after each command, the time the controller will
+next be ready is tracked, so only the remainder is waited before the next command, if any.
+If the RW pin is wired to the Pico, it can be provided to instead poll the controller's busy flag.
+Note: Reading the busy flag means the display drives the data pins, so the display must be
+ran at 3.3V (or via level shifting) when using this.
 """
 import utime
 
 
 class HD44780:
+    # Execution times, in microseconds, as per the datasheet (for a 270kHz controller clock)
+    COMMAND_DELAY_US = 37
+    WRITE_DELAY_US = 41  # 37us + 4us to update the address counter
+    CLEAR_DELAY_US = 1520  # Clear display & return home
 
-    def __init__(self, rs, enable, data4, data5, data6, data7):
+    def __init__(self, rs, enable, data4, data5, data6, data7, rw=None):
         """
         :type rs:machine.Pin
         :type enable:machine.Pin
@@ -21,6 +39,7 @@ class HD44780:
         :type data5:machine.Pin
         :type data6:machine.Pin
         :type data7:machine.Pin
+        :type rw:machine.Pin|None
         """
         self.pin_rs = rs
         self.pin_enable = enable
@@ -28,6 +47,13 @@ class HD44780:
         self.pin_data5 = data5
         self.pin_data6 = data6
         self.pin_data7 = data7
+        self.pin_rw = rw
+        self._use_busy_flag = False  # Only usable once the controller is initialized
+        self._ready_at = utime.ticks_us()
+        self._frame = bytearray(b" " * 32)  # What's currently shown on the display
+        self._next_frame = bytearray(32)  # Working space for building the frame to show
+        self._glyphs = bytearray(64)  # Rows of the custom characters loaded into CGRAM
+        self._glyphs_loaded = 0  # Bitmask of which CGRAM slots have been loaded
         self._initialize()
 
     def _initialize(self):
@@ -38,24 +64,75 @@ class HD44780:
         self._send_nibble(0x3)
         utime.sleep_us(100)
         self._send_nibble(0x3)
+        utime.sleep_us(self.COMMAND_DELAY_US)
         self._send_nibble(0x2)
+        utime.sleep_us(self.COMMAND_DELAY_US)
 
+        if self.pin_rw:
+            self.pin_rw.value(0)
         self._send_byte(0x28)  # 1[010]00 where [bits] = [0=Datalen(4 bit), 1=num_lines(2), 0=fontsize(5x8)]
+        self._use_busy_flag = self.pin_rw is not None
         self._send_byte(0x06)  # 000110 Cursor move direction, LTR
         self._send_byte(0x0C)  # 001[100] where [bits] = [1=Display On, 0=Cursor Off, 0=Blink Off]
         self._send_clear_function()
 
     def _send_byte(self, byte, character_mode=False):
+        self._wait_until_ready()
+
         # Write out nibbles seperated with pulse
         self._send_nibble(byte >> 4, character_mode)
         self._send_nibble(byte & 0xF, character_mode)
 
+        # Track when the controller will have executed this command
+        if character_mode:
+            delay = self.WRITE_DELAY_US
+        elif byte < 0x04:
+            delay = self.CLEAR_DELAY_US
+        else:
+            delay = self.COMMAND_DELAY_US
+        self._ready_at = utime.ticks_add(utime.ticks_us(), delay)
+
+    def _wait_until_ready(self):
+        # Wait until the controller has finished executing the last command sent
+        if self._use_busy_flag:
+            self._wait_for_busy_flag()
+            return
+
+        remaining = utime.ticks_diff(self._ready_at, utime.ticks_us())
+        if remaining > 0:
+            utime.sleep_us(remaining)
+
+    def _wait_for_busy_flag(self):
+        # Read the busy flag (D7 of the first nibble) until clear.
+        # Data pins are switched to inputs while the display drives them.
+        data_pins = (self.pin_data4, self.pin_data5, self.pin_data6, self.pin_data7)
+        for pin in data_pins:
+            pin.init(pin.IN)
+        self.pin_rs.value(0)
+        self.pin_rw.value(1)
+
+        # Gives up after the longest execution time, so a mis-wired RW pin can't lock things up
+        started = utime.ticks_us()
+        busy = True
+        while busy and utime.ticks_diff(utime.ticks_us(), started) < self.CLEAR_DELAY_US:
+            self.pin_enable.value(1)
+            utime.sleep_us(1)
+            busy = self.pin_data7.value()
+            self.pin_enable.value(0)
+            utime.sleep_us(1)
+            # Second nibble holds the address counter, which we don't need
+            self._pulse_enable()
+
+        self.pin_rw.value(0)
+        for pin in data_pins:
+            pin.init(pin.OUT)
+
     def _pulse_enable(self):
-        utime.sleep_us(1)
+        # Enable pulse width needs to be at least 450ns, with a 1us minimum cycle
         self.pin_enable.value(1)
         utime.sleep_us(1)
         self.pin_enable.value(0)
-        utime.sleep_us(37)
+        utime.sleep_us(1)
 
     def _send_nibble(self, nibble, character_mode=False):
         # Set to active = character_mode, inactive = command mode.
@@ -68,23 +145,76 @@ class HD44780:
 
         self._pulse_enable()
 
+    def _flush(self):
+        # Bytes are sent as they go here, but buffered backends send any pending bytes on flush
+        pass
+
     def _send_clear_function(self):
         self._send_byte(0x01)
+        # Clearing fills the display with spaces
+        for i in range(32):
+            self._frame[i] = 0x20
 
-    def write(self, message: str, clear=True):
+    def define_glyph(self, slot, rows):
+        """
+        Define a custom character in one of the 8 CGRAM slots (0-7).
+        Rows should be 8 bytes, top to bottom, with the lower 5 bits of each being the pixels of that row.
+        Characters already shown using this slot will update to the new glyph.
+        """
+        if slot < 0 or slot > 7:
+            raise ValueError("Glyph slot must be 0-7")
+
+        offset = slot * 8
+        if self._glyphs_loaded & (1 << slot):
+            for i in range(8):
+                if self._glyphs[offset + i] != rows[i]:
+                    break
+            else:
+                return
+
+        self._send_byte(0x40 | (slot << 3))  # Set CGRAM address
+        for i in range(8):
+            self._send_byte(rows[i], True)
+            self._glyphs[offset + i] = rows[i]
+        self._glyphs_loaded |= 1 << slot
+        self._flush()
+        # The cursor now points into CGRAM, but write() always sets a display position before sending characters
+
+    def write(self, message: str, clear=False):
+        """
+        Show the given message on the display, with a "\n" splitting the two lines.
+        Lines are cut to 16 characters, and any remaining space is shown blank.
+        Characters beyond the display's 8-bit character set are shown as "?".
+        Only characters that differ from what's currently shown are sent.
+        The display is only cleared if requested.
+        """
         if clear:
             self._send_clear_function()
 
-        # Split input to two 16-max char lines for the display before writing them out
-        lines = list(map(lambda s: s[:16], message.split("\n", 2)))
-        multiline = True if len(lines) is 2 else False
-
-        for index, line in enumerate(lines):
-            # Manually set the cursor position if we're handling multi-line data
-            # So that text shows on the correct lines in the right place.
-            if multiline:
-                self._send_byte(0x80 if index is 0 else 0xc0)
-
-            # Send through the characters of the line
-            for char in line:
-                self._send_byte(ord(char), True)
+        # Build the new frame, with each of the lines padded out to 16 characters
+        lines = message.split("\n", 2)
+        frame = self._next_frame
+        for row in range(2):
+            line = lines[row] if row < len(lines) else ""
+            offset = row * 16
+            for col in range(16):
+                char = ord(line[col]) if col < len(line) else 0x20
+                frame[offset + col] = char if char < 0x100 else 0x3F
+
+        # Send through the changed characters, only moving the cursor when
+        # the next changed character isn't where the cursor already is.
+        cursor = -1
+        for index in range(32):
+            char = frame[index]
+            if char == self._frame[index]:
+                continue
+
+            if cursor != index:
+                self._send_byte((0x80 if index < 16 else 0xc0) | (index & 0xF))
+            self._send_byte(char, True)
+            self._frame[index] = char
+
+            # The cursor doesn't follow on from the end of the first line to the second
+            cursor = index + 1 if index != 15 else -1
+
+        self._flush()
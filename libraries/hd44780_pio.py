@@ -0,0 +1,116 @@
+"""
+PIO backend for the HD44780 driver.
+
+Provides the same API as the HD44780 class, but rather than toggling each pin from python,
+bytes are queued into a buffer then fed to an rp2 PIO state machine which shifts out each
+nibble with hardware-timed enable pulses and command execution waits.
+A full screen update then becomes one buffered transfer.
+
+The display is initialized by bit-banging the pins, as done by the HD44780 class,
+before the pins are handed over to the state machine.
+
+Note: The PIO program outputs the data nibble across a consecutive range of pins,
+so data4 to data7 must be wired to consecutive GPIO pins, in order.
+RS and Enable can be on any other pins. The RW pin/busy flag is not used.
+
+This can be used like so:
+    lcd = HD44780PIO(lcd_rs, lcd_enable, lcd_data4, lcd_data5, lcd_data6, lcd_data7)
+    lcd.write("Hello there\nGeneral Kenobi")
+"""
+import array
+import rp2
+import utime
+from libraries.hd44780 import HD44780
+
+
+# Each 9 bit word received is the RS flag followed by the byte to send.
+# Ran at 1MHz so each cycle is 1us.
+@rp2.asm_pio(
+    out_init=(rp2.PIO.OUT_LOW,) * 4,
+    set_init=rp2.PIO.OUT_LOW,
+    sideset_init=rp2.PIO.OUT_LOW,
+    out_shiftdir=rp2.PIO.SHIFT_LEFT,
+    autopull=True,
+    pull_thresh=9,
+    fifo_join=rp2.PIO.JOIN_TX,
+)
+def _hd44780_write():
+    # Set RS from the first bit
+    out(x, 1)           .side(0)
+    jmp(not_x, "rs_low")
+    set(pins, 1)
+    jmp("send")
+    label("rs_low")
+    set(pins, 0)
+    label("send")
+    # High nibble, then pulse enable for 2us
+    out(pins, 4)        .side(0) [1]
+    nop()               .side(1) [1]
+    nop()               .side(0)
+    # Low nibble, then pulse enable for 2us
+    out(pins, 4)        .side(0) [1]
+    nop()               .side(1) [1]
+    nop()               .side(0)
+    # Wait 42us for the controller to execute the byte
+    set(x, 20)
+    label("wait")
+    jmp(x_dec, "wait")  [1]
+
+
+class HD44780PIO(HD44780):
+    BUFFER_SIZE = 64  # Words buffered before being fed to the state machine
+
+    def __init__(self, rs, enable, data4, data5, data6, data7, state_machine=0):
+        """
+        :type rs:machine.Pin
+        :type enable:machine.Pin
+        :type data4:machine.Pin
+        :type data5:machine.Pin
+        :type data6:machine.Pin
+        :type data7:machine.Pin
+        :type state_machine:int
+        """
+        self._sm = None
+        self._words = array.array('H', [0] * self.BUFFER_SIZE)
+        self._words_view = memoryview(self._words)
+        self._word_count = 0
+        super().__init__(rs, enable, data4, data5, data6, data7)
+
+        self._sm = rp2.StateMachine(
+            state_machine,
+            _hd44780_write,
+            freq=1000000,
+            set_base=rs,
+            out_base=data4,
+            sideset_base=enable,
+        )
+        self._sm.active(1)
+
+    def _send_byte(self, byte, character_mode=False):
+        # Bit-bang via the standard driver while initializing
+        if self._sm is None:
+            super()._send_byte(byte, character_mode)
+            return
+
+        self._words[self._word_count] = (0x100 if character_mode else 0) | byte
+        self._word_count += 1
+
+        # Clear & return home take longer than the state machine waits, so we wait them out here
+        if not character_mode and byte < 0x04:
+            self._flush()
+            self._wait_until_sent()
+            utime.sleep_us(self.CLEAR_DELAY_US)
+        elif self._word_count == self.BUFFER_SIZE:
+            self._flush()
+
+    def _flush(self):
+        # Shift words up to the top of the 32-bit output register, since the program shifts out left
+        if self._word_count:
+            self._sm.put(self._words_view[0:self._word_count], 23)
+            self._word_count = 0
+
+    def _wait_until_sent(self):
+        while self._sm.tx_fifo():
+            pass
+        # The last word can still be being shifted out once the FIFO is empty
+        utime.sleep_us(50)
@@ -0,0 +1,50 @@
+"""
+Shared framework for the sensor nodes, which report sensor readings to Home Assistant via MQTT.
+
+A device script defines its sensors, then hands them to a Node to run:
+    node = Node(
+        device_name='Picow A',
+        sensors=[
+            Sensor(
+                name='Picow A Proximity',
+                id='picow_a_proximity',
+                type='binary_sensor',
+                status_getter=(lambda: 'ON' if m_sens.value() else 'OFF'),
+                device_class='motion',
+                irq_pin=m_sens,
+                poll_rate_ms=60000
+            ),
+        ],
+    )
+    node.run()
+
+The node connects to WiFi & MQTT, publishes Home Assistant discovery config for each sensor,
+then polls each sensor at its poll rate, publishing the sensor state when it changes.
+Sensors given an irq_pin are also updated on each edge of that pin, so can use a slow poll rate.
+
+The classes here are only imported when first used, so a script can start connecting to WiFi before
+loading the rest:
+    from libraries.node import WiFi
+    wifi = WiFi()
+    wifi.start()
+    # ... Driver setup, then importing & running the Node with wifi=wifi
+"""
+
+_exports = {
+    'Sensor': 'sensor',
+    'Node': 'node',
+    'Filter': 'filters',
+    'OfflineLog': 'offline_log',
+    'WiFi': 'wifi',
+    'timeline': 'timeline',
+}
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(name)
+    module = __import__('libraries.node.' + _exports[name], None, None, (name,))
+    # MicroPython tries the package's __getattr__ before its submodules, so modules are exported here too
+    if name == _exports[name]:
+        return module
+    return getattr(module, name)
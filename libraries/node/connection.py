@@ -0,0 +1,28 @@
+import config
+
+
+def mqtt_connect(client_id):
+    # Imported here so it's only loaded once it's needed, rather than holding up startup
+    from umqtt.simple import MQTTClient
+
+    client = MQTTClient(
+        client_id,
+        config.mqtt_server,
+        keepalive=3600,
+        user=config.mqtt_user,
+        password=config.mqtt_pass
+    )
+    client.connect(True)
+    print('Connected to %s MQTT Broker' % (config.mqtt_server))
+    return client
+
+
+def sync_time():
+    """ Set the clock via NTP, returning True if successful """
+    import ntptime
+    try:
+        ntptime.settime()
+        return True
+    except (OSError, OverflowError) as err:
+        print('Failed to set the time:', err)
+        return False
@@ -0,0 +1,70 @@
+from array import array
+
+
+class Filter:
+    """
+    Smooths a numeric sensor's readings, so a single noisy read doesn't go straight to publishing.
+    Each reading is added to a ring buffer of the last `median_of` readings, with the median of those
+    then fed into an exponential moving average, where `ema_alpha` is the weight given to each new median
+    (1 to disable averaging).
+    Intended to be used with a sensor polled faster than it needs publishing, with the sensor's
+    deadband then deciding when the smoothed value is published.
+    Storage is allocated upfront so adding readings doesn't allocate.
+    """
+
+    def __init__(self, median_of=5, ema_alpha=0.3):
+        self.ema_alpha = ema_alpha
+        self.value = None
+        self._samples = array('f', [0] * median_of)
+        self._sorted = array('f', [0] * median_of)
+        self._count = 0
+        self._index = 0
+
+    def add(self, reading):
+        """ Add a new reading, returning the new filtered value """
+        size = len(self._samples)
+        self._samples[self._index] = reading
+        self._index = (self._index + 1) % size
+        if self._count < size:
+            self._count += 1
+
+        median = self._median()
+        if self.value is None:
+            self.value = median
+        else:
+            self.value += self.ema_alpha * (median - self.value)
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self._count = 0
+        self._index = 0
+
+    def _median(self):
+        # Insertion sort the current samples into the scratch buffer. Fine for the handful of samples used.
+        count = self._count
+        ordered = self._sorted
+        for i in range(count):
+            sample = self._samples[i]
+            j = i
+            while j > 0 and ordered[j - 1] > sample:
+                ordered[j] = ordered[j - 1]
+                j -= 1
+            ordered[j] = sample
+
+        middle = count // 2
+        if count % 2:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def apply_calibration(sensors, calibration):
+    """
+    Apply calibration to the given sensors, from a dict of sensor id to calibration values. For example:
+        {'picow_a_temp': {'offset': -5.0}, 'picow_b_rh': {'gain': 1.02, 'offset': -1.5}}
+    """
+    for sensor in sensors:
+        values = calibration.get(sensor.id)
+        if values:
+            sensor.offset = values.get('offset', sensor.offset)
+            sensor.gain = values.get('gain', sensor.gain)
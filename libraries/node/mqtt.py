@@ -0,0 +1,110 @@
+import uasyncio as asyncio
+from libraries.node import timeline
+from libraries.node.connection import mqtt_connect
+
+
+class MQTTConnection:
+    """
+    Keeps a connection to the MQTT broker, and the WiFi connection it needs, in the background,
+    sending queued messages whenever connected so that publishing never has to wait on the network.
+    Messages are sent in the order queued, with up to queue_size held while disconnected, beyond which
+    the oldest are dropped.
+    Failed connection attempts are retried with exponential backoff, from min_backoff_ms up to max_backoff_ms.
+    on_connect is called with the MQTT client once connected, before any queued messages are sent.
+    """
+
+    def __init__(self, client_id, wifi, on_connect=None, on_disconnect=None, queue_size=32,
+                 min_backoff_ms=1000, max_backoff_ms=60000, link_check_ms=5000):
+        self.client_id = client_id
+        self.wifi = wifi
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.queue_size = queue_size
+        self.min_backoff_ms = min_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.link_check_ms = link_check_ms
+        self.client = None
+        self.connected = False
+        self.dropped = 0
+        self._queue = []
+        self.first_sent = asyncio.Event()
+        self._pending = asyncio.Event()
+
+    def publish(self, topic, msg, retain=False):
+        """ Queue a message to be sent. Returns right away. """
+        if len(self._queue) >= self.queue_size:
+            self._queue.pop(0)
+            self.dropped += 1
+        self._queue.append((topic, msg, retain))
+        self._pending.set()
+
+    async def wait_until_sent(self):
+        """ Wait until all queued messages have been sent """
+        while self._queue:
+            await asyncio.sleep_ms(50)
+
+    async def run(self):
+        """ Run the connection as a background task """
+        backoff_ms = self.min_backoff_ms
+        while True:
+            if not self.connected:
+                if not await self._connect():
+                    print('Retrying connection in %dms' % backoff_ms)
+                    await asyncio.sleep_ms(backoff_ms)
+                    backoff_ms = min(backoff_ms * 2, self.max_backoff_ms)
+                    continue
+                backoff_ms = self.min_backoff_ms
+
+            self._pending.clear()
+            self._send_queued()
+            if not self.connected or self._queue:
+                continue
+
+            try:
+                await asyncio.wait_for_ms(self._pending.wait(), self.link_check_ms)
+            except asyncio.TimeoutError:
+                # A dropped WiFi link may otherwise go unnoticed until the next send
+                if not self.wifi.isconnected():
+                    self._disconnected()
+
+    async def _connect(self):
+        # Imported here, as with the client, so umqtt is only loaded once connecting
+        from umqtt.simple import MQTTException
+
+        try:
+            if not self.wifi.isconnected():
+                await self.wifi.connect()
+                timeline.mark('wifi')
+            self.client = mqtt_connect(self.client_id)
+            self.connected = True
+            if self.on_connect:
+                self.on_connect(self.client)
+            return True
+        except (OSError, RuntimeError, MQTTException) as err:
+            # MQTTException is raised when the broker refuses the connection, such as for bad credentials
+            print('Failed to connect:', err)
+            if self.connected:
+                self._disconnected()
+            return False
+
+    def _send_queued(self):
+        queue = self._queue
+        while queue and self.connected:
+            topic, msg, retain = queue[0]
+            try:
+                self.client.publish(topic, msg, retain)
+            except OSError as err:
+                print('Lost connection to the MQTT Broker:', err)
+                self._disconnected()
+                return
+            queue.pop(0)
+            self.first_sent.set()
+
+    def _disconnected(self):
+        self.connected = False
+        try:
+            self.client.disconnect()
+        except OSError:
+            pass
+        if self.on_disconnect:
+            self.on_disconnect()
@@ -0,0 +1,226 @@
+import machine
+import time
+import uasyncio as asyncio
+import config
+from libraries.node import timeline
+from libraries.node.connection import sync_time
+from libraries.node.filters import apply_calibration
+from libraries.node.mqtt import MQTTConnection
+from libraries.node.publisher import Publisher
+from libraries.node.scheduler import Scheduler
+from libraries.node.wifi import WiFi
+
+# Number of offline log records sent per history message
+HISTORY_CHUNK_SIZE = 32
+
+
+class Node:
+    """
+    Runs a device's sensors: Polls each sensor at its poll rate, publishing its state on change.
+    The WiFi & MQTT connection is kept up in the background, with Home Assistant config for each sensor
+    published on connect, and states queued to be sent whenever connected, so polling never waits on the network.
+    Sensors with an irq_pin are also updated as soon as an edge is seen on that pin.
+
+    Optional hooks:
+      - tasks: Coroutine functions to run as background tasks, such as sensor driver measurement cycles.
+      - on_tick: Called every tick_ms, and after each interrupt driven update, such as for updating a display.
+        Only called once every sensor has been read for the first time.
+      - on_connect/on_disconnect: Called when the MQTT connection is made/lost.
+      - on_error: Called with any unhandled error. Errors are raised if not provided.
+    Sensor calibration is applied from config.calibration, if set.
+    If activity_led is provided, it will be flashed while running when activity_enabled() returns True.
+    If batch is True, sensor states are published together as one JSON message for the device, rather than
+    one message per sensor. Changes within batch_window_ms of each other are sent in the same message.
+    If an OfflineLog is provided as offline_log, numeric readings published while disconnected are also
+    written to it, then sent on to the device's history topic once reconnected. Logging only starts once
+    the clock has been set via NTP, so the readings have real timestamps.
+    A WiFi can be provided as wifi, such as one already started so it connects while drivers are set up.
+    Otherwise one is created using the wifi_ options.
+    The startup timeline is printed, and published retained to the device's boot topic, once the first state is sent.
+    """
+
+    def __init__(self, device_name, sensors, client_id=None, tasks=(), on_tick=None, on_connect=None,
+                 on_disconnect=None, on_error=None, activity_led=None, activity_enabled=(lambda: True),
+                 wifi_power_save=True, wifi_country=None, wifi_timeout_ms=10000, batch=False,
+                 batch_window_ms=20, offline_log=None, wifi=None, tick_ms=250):
+        self.device_name = device_name
+        self.device_id = device_name.lower().replace(' ', '_')
+        self.sensors = sensors
+        self.client_id = client_id or self.device_id
+        self.tasks = tasks
+        self.on_tick = on_tick
+        self.tick_ms = tick_ms
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.on_error = on_error
+        self.activity_led = activity_led
+        self.activity_enabled = activity_enabled
+        self.batch = batch
+        self.batch_window_ms = batch_window_ms
+        self._batch_queued = False
+        self.offline_log = offline_log
+        self._clock_set = False
+        self._replaying = False
+        self._sensors_read = False
+        self.wifi = wifi or WiFi(wifi_power_save, wifi_country, wifi_timeout_ms)
+        self.mqtt = MQTTConnection(self.client_id, self.wifi, self._on_mqtt_connect, self._on_mqtt_disconnect)
+        self.publisher = Publisher(self.mqtt, self.device_name, self.device_id, self.batch)
+        # Sensor calibration can be set per-device in config, as a dict of sensor id to offset/gain values
+        apply_calibration(sensors, getattr(config, 'calibration', {}))
+
+    @property
+    def wlan(self):
+        return self.wifi.wlan
+
+    def run(self):
+        try:
+            asyncio.run(self.run_async())
+        except Exception as err:
+            self._handle_error(err)
+
+    def _on_mqtt_connect(self, client):
+        timeline.mark('mqtt')
+        # Configs are sent straight away, ahead of any queued states. They're retained by the broker,
+        # so this only sends those not already published as they are.
+        self.publisher.publish_configs(self.sensors, client)
+        timeline.mark('discovery')
+        if self.offline_log:
+            if not self._clock_set:
+                self._clock_set = sync_time()
+            if not self._replaying:
+                asyncio.create_task(self.replay_offline_log())
+        if self.on_connect:
+            self.on_connect()
+
+    def _on_mqtt_disconnect(self):
+        if self.on_disconnect:
+            self.on_disconnect()
+
+    async def publish_batch(self):
+        # Wait briefly first so that sensors updated together, such as those sharing a
+        # driver reading, go out in the same message.
+        await asyncio.sleep_ms(self.batch_window_ms)
+        self._batch_queued = False
+        self.publisher.publish_batch(self.sensors)
+        # Every sensor's status goes out in the batch, so they've all now been published
+        now = time.ticks_ms()
+        for sensor in self.sensors:
+            sensor.published_at = now
+
+    async def report_boot_timeline(self):
+        await self.mqtt.first_sent.wait()
+        timeline.mark('first publish')
+        print('Boot timeline:', timeline.summary())
+        self.publisher.publish_boot_timeline(timeline.marks)
+
+    async def replay_offline_log(self):
+        # Logged readings are sent in chunks, waiting for each to be sent before queueing the next
+        # so that the replay doesn't push live states out of the queue.
+        log = self.offline_log
+        self._replaying = True
+        log.flush()
+        generation = log.generation
+        position = 0
+        try:
+            while True:
+                records = log.read(position, HISTORY_CHUNK_SIZE)
+                if not records:
+                    break
+                self.publisher.publish_history(self.sensors, records)
+                await self.mqtt.wait_until_sent()
+                position += len(records)
+                if log.generation != generation:
+                    # The log was rotated by readings logged during the replay, so start over
+                    generation = log.generation
+                    position = 0
+            log.clear()
+        finally:
+            self._replaying = False
+
+    async def update_sensor(self, sensor):
+        if sensor.refresh:
+            await sensor.refresh()
+        if not sensor.check_status():
+            return
+        if self.offline_log and self._clock_set and sensor.value_format and not self.mqtt.connected:
+            self.offline_log.add(time.time(), self.sensors.index(sensor), sensor.value)
+        if not self.batch:
+            self.publisher.publish_state(sensor)
+        elif not self._batch_queued:
+            self._batch_queued = True
+            asyncio.create_task(self.publish_batch())
+
+    async def watch_sensor(self, sensor):
+        # The IRQ handler only records the edge and wakes this task, with the update & publish then
+        # running within the event loop as normal.
+        flag = asyncio.ThreadSafeFlag()
+
+        def on_edge(pin):
+            sensor.edge_at = time.ticks_ms()
+            flag.set()
+
+        sensor.irq_pin.irq(handler=on_edge, trigger=machine.Pin.IRQ_RISING | machine.Pin.IRQ_FALLING)
+        while True:
+            await flag.wait()
+            await self.update_sensor(sensor)
+            if self.on_tick and self._sensors_read:
+                self.on_tick()
+
+    async def tick(self):
+        # Display & LED updates run at their own rate, as sensors may not be polled for a minute at a time
+        last_activity_led_change = time.ticks_ms()
+        while True:
+            now = time.ticks_ms()
+
+            # Toggle activity led to indicate activity, limited to 200ms changes at minimum
+            # so flashing is visible.
+            if self.activity_led and self.activity_enabled() and time.ticks_diff(now, last_activity_led_change) > 200:
+                self.activity_led.value(not self.activity_led.value())
+                last_activity_led_change = now
+
+            if self.on_tick:
+                self.on_tick()
+            await asyncio.sleep_ms(self.tick_ms)
+
+    def _handle_error(self, err):
+        if not self.on_error:
+            raise err
+        print("An error occurred:", err)
+        self.on_error(err)
+
+    def _handle_task_exception(self, loop, context):
+        # Errors within sensor update tasks don't reach the main try/except, so handle them here
+        self._handle_error(context["exception"])
+
+    async def run_async(self):
+        """ Run the node as a coroutine, such as to run it for a limited time. Errors are raised rather than handled. """
+        asyncio.get_event_loop().set_exception_handler(self._handle_task_exception)
+        asyncio.create_task(self.mqtt.run())
+        asyncio.create_task(self.report_boot_timeline())
+        for task in self.tasks:
+            asyncio.create_task(task())
+
+        # Initial sensor states. Edges are watched from as soon as a sensor has been read, but on_tick
+        # waits until every sensor has a state, as slow sensors can take a while to give a first reading.
+        for sensor in self.sensors:
+            await self.update_sensor(sensor)
+            if sensor.irq_pin:
+                asyncio.create_task(self.watch_sensor(sensor))
+        self._sensors_read = True
+
+        if self.activity_led or self.on_tick:
+            asyncio.create_task(self.tick())
+        scheduler = Scheduler(self.sensors)
+
+        # Poll sensors
+        while True:
+            now = time.ticks_ms()
+
+            # Updates run as their own tasks so slow sensor reads don't hold up the others.
+            sensor = scheduler.next_due(now)
+            while sensor:
+                asyncio.create_task(self.update_sensor(sensor))
+                sensor = scheduler.next_due(now)
+
+            # Sleep until the next sensor is due to be polled
+            await asyncio.sleep_ms(scheduler.time_to_next_poll(time.ticks_ms()))
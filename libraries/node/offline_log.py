@@ -0,0 +1,94 @@
+import os
+import struct
+
+# Records are the reading's timestamp (seconds), the sensor's index within the node, and the reading
+RECORD_FORMAT = '<IBf'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+
+class OfflineLog:
+    """
+    A log of sensor readings taken while offline, kept in flash so they can be sent on once back online,
+    even if the device has been reset in the meantime. Readings are stored as fixed-size binary records.
+
+    To limit flash wear, records are buffered in memory then appended in batches, once batch_size records
+    are buffered or the oldest buffered record is flush_after_s old.
+    The log is split across two files, with new records appended to one until it holds half of max_records,
+    at which point it replaces the other. This keeps the log within max_records, by dropping the oldest half,
+    without needing to rewrite any records in place.
+    """
+
+    def __init__(self, path='offline_log', max_records=4096, batch_size=16, flush_after_s=600):
+        self.paths = (path + '.1', path + '.0')  # Oldest first
+        self.max_records = max_records
+        self.flush_after_s = flush_after_s
+        # Incremented when existing records are moved or removed, so readers can tell their position is stale
+        self.generation = 0
+        self._buffer = bytearray(batch_size * RECORD_SIZE)
+        self._buffered = 0
+        self._buffered_at = 0
+        self._current_records = self._count_records(self.paths[1])
+
+    def add(self, timestamp, index, value):
+        if not self._buffered:
+            self._buffered_at = timestamp
+        struct.pack_into(RECORD_FORMAT, self._buffer, self._buffered * RECORD_SIZE, timestamp, index, value)
+        self._buffered += 1
+        if self._buffered * RECORD_SIZE >= len(self._buffer) or timestamp - self._buffered_at >= self.flush_after_s:
+            self.flush()
+
+    def flush(self):
+        """ Write any buffered records to flash """
+        if not self._buffered:
+            return
+        with open(self.paths[1], 'ab') as file:
+            file.write(memoryview(self._buffer)[0:self._buffered * RECORD_SIZE])
+        self._current_records += self._buffered
+        self._buffered = 0
+        if self._current_records >= self.max_records // 2:
+            self._rotate()
+
+    def read(self, position, count):
+        """ Read up to count records, as (timestamp, index, value) tuples, from the given position in the log """
+        records = []
+        for path in self.paths:
+            size = self._count_records(path)
+            if position >= size:
+                position -= size
+                continue
+            with open(path, 'rb') as file:
+                file.seek(position * RECORD_SIZE)
+                data = file.read(min(count - len(records), size - position) * RECORD_SIZE)
+            for offset in range(0, len(data), RECORD_SIZE):
+                records.append(struct.unpack_from(RECORD_FORMAT, data, offset))
+            position = 0
+            if len(records) >= count:
+                break
+        return records
+
+    def clear(self):
+        """ Remove all records written to flash """
+        for path in self.paths:
+            self._remove(path)
+        self._current_records = 0
+        self.generation += 1
+
+    def _rotate(self):
+        self._remove(self.paths[0])
+        os.rename(self.paths[1], self.paths[0])
+        self._current_records = 0
+        self.generation += 1
+
+    @staticmethod
+    def _count_records(path):
+        try:
+            return os.stat(path)[6] // RECORD_SIZE
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
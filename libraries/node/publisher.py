@@ -0,0 +1,126 @@
+import binascii
+import hashlib
+import json
+
+# https://mpython.readthedocs.io/en/master/library/mPython/umqtt.simple.html
+
+
+class Publisher:
+    """
+    Publishes sensor states, and their Home Assistant discovery config, via an MQTT client.
+    In batch mode, the states of all the device's sensors are published together as a single JSON message
+    to a device state topic, with each sensor's config using a value_template to pick out its own state.
+    Config payloads are built once per sensor then cached, since they don't change.
+    Configs are published retained, with a hash of each published config kept in hash_file on flash,
+    so they're only re-sent when they change. Delete the file to force them to be re-sent.
+    """
+
+    def __init__(self, client, device_name, device_id, batch=False, hash_file='discovery_hashes'):
+        self.client = client
+        self.device_name = device_name
+        self.device_id = device_id
+        self.batch = batch
+        self.batch_state_topic = 'homeassistant/sensor/{id}/state'.format(id=device_id).encode()
+        self.history_topic = 'homeassistant/sensor/{id}/history'.format(id=device_id).encode()
+        self.boot_topic = 'homeassistant/sensor/{id}/boot'.format(id=device_id).encode()
+        self._batch_states = {}
+        self._config_payloads = {}
+        self.hash_file = hash_file
+        self._config_hashes = None
+
+    def publish_state(self, sensor):
+        self.client.publish(sensor.state_topic, sensor.status_payload)
+
+    def publish_batch(self, sensors):
+        states = self._batch_states
+        for sensor in sensors:
+            states[sensor.id] = sensor.status
+        self.client.publish(self.batch_state_topic, json.dumps(states).encode())
+
+    def publish_boot_timeline(self, marks):
+        """ Publish, retained, the startup timeline as JSON of phase to ms since boot """
+        timeline = {}
+        for phase, at in marks:
+            timeline[phase] = at
+        self.client.publish(self.boot_topic, json.dumps(timeline).encode(), True)
+
+    def publish_history(self, sensors, records):
+        """
+        Publish readings logged while offline, given as (timestamp, sensor index, value) records,
+        as JSON of sensor id to a list of [timestamp, value] pairs.
+        """
+        history = {}
+        for timestamp, index, value in records:
+            if index < len(sensors):
+                sensor = sensors[index]
+                # Values are rounded to the sensor's own format, rather than sent with float noise
+                history.setdefault(sensor.id, []).append((timestamp, float(sensor.value_format % value)))
+        self.client.publish(self.history_topic, json.dumps(history).encode())
+
+    def publish_configs(self, sensors, client=None):
+        """
+        Publish the config for each of the given sensors, skipping those already published as they are.
+        A client can be given to send these via, instead of the publisher's own client.
+        """
+        hashes = self._load_config_hashes()
+        changed = False
+        for sensor in sensors:
+            config_hash = binascii.hexlify(hashlib.sha256(sensor.config_topic + self._config_payload(sensor)).digest())
+            if hashes.get(sensor.id) == config_hash:
+                continue
+            self.publish_config(sensor, client)
+            hashes[sensor.id] = config_hash
+            changed = True
+
+        if changed:
+            self._save_config_hashes()
+
+    def publish_config(self, sensor, client=None):
+        (client or self.client).publish(sensor.config_topic, self._config_payload(sensor), True)
+
+    def _config_payload(self, sensor):
+        payload = self._config_payloads.get(sensor.id)
+        if payload is None:
+            payload = self._build_config_payload(sensor)
+            self._config_payloads[sensor.id] = payload
+        return payload
+
+    def _load_config_hashes(self):
+        if self._config_hashes is None:
+            self._config_hashes = {}
+            try:
+                with open(self.hash_file, 'rb') as file:
+                    for line in file:
+                        sensor_id, config_hash = line.split()
+                        self._config_hashes[sensor_id.decode()] = config_hash
+            except (OSError, ValueError):
+                # Missing or unreadable, so all configs will be re-sent
+                pass
+        return self._config_hashes
+
+    def _save_config_hashes(self):
+        with open(self.hash_file, 'wb') as file:
+            for sensor_id, config_hash in self._config_hashes.items():
+                file.write(sensor_id.encode() + b' ' + config_hash + b'\n')
+
+    def _build_config_payload(self, sensor):
+        configure_payload = {
+            "name": sensor.name,
+            "state_topic": (self.batch_state_topic if self.batch else sensor.state_topic).decode(),
+            "unique_id": sensor.id,
+            "device": {
+                "name": self.device_name,
+                "identifiers": [self.device_id]
+            }
+        }
+
+        if self.batch:
+            configure_payload["value_template"] = "{{ value_json.%s }}" % sensor.id
+
+        if sensor.device_class:
+            configure_payload["device_class"] = sensor.device_class
+
+        if sensor.unit_of_measurement:
+            configure_payload["unit_of_measurement"] = sensor.unit_of_measurement
+
+        return json.dumps(configure_payload).encode()
@@ -0,0 +1,62 @@
+import heapq
+import time
+
+# Deadlines are kept relative to an epoch, rather than as raw ticks values, so that ordering
+# them isn't broken when ticks wrap around. The epoch is moved forward once deadlines get
+# this far from it, keeping the relative values well within the ticks range.
+REBASE_AFTER_MS = 1 << 24
+
+# Time to sleep for when there are no sensors to poll
+IDLE_SLEEP_MS = 1000
+
+
+class Scheduler:
+    """
+    Tracks when each sensor is next due to be polled, using a min-heap of deadlines
+    so the next due sensor is always at the top.
+    Each new deadline follows on from the sensor's previous deadline, rather than from when it
+    was actually polled, so lateness in polling doesn't cause the poll times to drift.
+    """
+
+    def __init__(self, sensors, now=None):
+        self._epoch = time.ticks_ms() if now is None else now
+        # Entries are [deadline, index, sensor], where index breaks ties before comparing sensors.
+        # Entries are re-used when rescheduling, so that polling doesn't allocate.
+        self._heap = [[sensor.poll_rate_ms, index, sensor] for index, sensor in enumerate(sensors)]
+        heapq.heapify(self._heap)
+
+    def _offset(self, now):
+        # Get the time relative to the epoch, rebasing the epoch and deadlines if needed.
+        offset = time.ticks_diff(now, self._epoch)
+        if offset >= REBASE_AFTER_MS:
+            for entry in self._heap:
+                entry[0] -= offset
+            self._epoch = now
+            offset = 0
+        return offset
+
+    def next_due(self, now):
+        """ Get the next sensor due to be polled at the given time, scheduling its next poll. None if none are due. """
+        if not self._heap:
+            return None
+        offset = self._offset(now)
+        entry = self._heap[0]
+        if entry[0] > offset:
+            return None
+
+        entry = heapq.heappop(self._heap)
+        sensor = entry[2]
+        deadline = entry[0] + sensor.poll_rate_ms
+        if deadline <= offset:
+            # We've fallen behind by more than a whole poll period, so skip the missed polls
+            # while staying aligned to the original schedule.
+            deadline += ((offset - deadline) // sensor.poll_rate_ms + 1) * sensor.poll_rate_ms
+        entry[0] = deadline
+        heapq.heappush(self._heap, entry)
+        return sensor
+
+    def time_to_next_poll(self, now):
+        """ Get the time, in ms, until the next sensor is due to be polled """
+        if not self._heap:
+            return IDLE_SLEEP_MS
+        return max(self._heap[0][0] - self._offset(now), 0)
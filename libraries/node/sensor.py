@@ -0,0 +1,98 @@
+import time
+
+
+class Sensor:
+    """
+    A sensor reported to Home Assistant, read via status_getter.
+
+    By default status_getter returns the status string to publish, which is published whenever it changes.
+    For numeric sensors, provide a value_format (eg. '%.2f') and have status_getter return the raw number.
+    The raw reading is then kept in `value`, and only formatted when it's to be published, which is when
+    it moves more than the deadband away from the last published value. The deadband is the larger of
+    `deadband` (absolute) and `deadband_ratio` (relative to the last published value).
+    Since the deadband is measured from the last published value, readings jittering around a value
+    won't be published, while a slow drift will be once it builds up past the deadband.
+    Numeric readings can be calibrated, as `reading * gain + offset`, and smoothed via a Filter,
+    before being checked against the deadband.
+    If max_silence_ms is set, the status will be re-published if it hasn't been published within that time,
+    so Home Assistant can tell the sensor is still alive.
+    """
+
+    def __init__(self, name, id, type, status_getter, device_class='', unit_of_measurement='', poll_rate_ms=1000,
+                 refresh=None, on_change=None, irq_pin=None, value_format=None, deadband=0, deadband_ratio=0,
+                 max_silence_ms=None, offset=0, gain=1, filter=None):
+        self.name = name
+        self.id = id
+        self.type = type  # https://www.home-assistant.io/integrations/mqtt/#mqtt-discovery
+        self.status_getter = status_getter
+        self.device_class = device_class  # https://www.home-assistant.io/integrations/sensor/#device-class
+        self.poll_rate_ms = poll_rate_ms
+        self.status = None
+        self.status_payload = None  # The status encoded for publishing, updated when the status changes
+        self.last_status = None
+        self.value = None
+        self.value_format = value_format
+        self.deadband = deadband
+        self.deadband_ratio = deadband_ratio
+        self.max_silence_ms = max_silence_ms
+        self.offset = offset
+        self.gain = gain
+        self.filter = filter
+        self.published_value = None
+        self.published_at = None
+        self.on_change_handlers = []
+        self.unit_of_measurement = unit_of_measurement
+        self.refresh = refresh  # Optional coroutine function to await before reading status
+        # Optional pin to watch for edges, so changes are published right away instead of waiting for a poll.
+        # The sensor is still polled at its poll rate as a fallback, in case an edge is missed.
+        self.irq_pin = irq_pin
+        self.edge_at = None  # ticks_ms of the last edge seen on irq_pin
+        # Topics are encoded upfront, so publishing doesn't need to allocate for them
+        self.state_topic = 'homeassistant/{type}/{id}/state'.format(type=type, id=id).encode()
+        self.config_topic = 'homeassistant/{type}/{id}/config'.format(type=type, id=id).encode()
+        if on_change:
+            self.on_change_handlers.append(on_change)
+
+    def check_status(self):
+        """ Read the sensor, returning True if its status should now be published """
+        self.value = self.status_getter()
+        now = time.ticks_ms()
+        silence_exceeded = self._silence_exceeded(now)
+
+        if self.value_format:
+            self.value = self.value * self.gain + self.offset
+            if self.filter:
+                self.value = self.filter.add(self.value)
+            if not silence_exceeded and not self._exceeds_deadband(self.value):
+                return False
+            status = self.value_format % self.value
+        else:
+            status = self.value
+
+        changed = status != self.status
+        if not changed and not silence_exceeded:
+            return False
+
+        self.published_value = self.value
+        self.published_at = now
+        if changed:
+            self.last_status = self.status
+            self.status = status
+            self.status_payload = status.encode()
+            for handler in self.on_change_handlers:
+                handler(status, self)
+        return True
+
+    def add_on_change_handler(self, handler):
+        self.on_change_handlers.append(handler)
+
+    def _exceeds_deadband(self, value):
+        if self.published_value is None:
+            return True
+        band = max(self.deadband, abs(self.published_value) * self.deadband_ratio)
+        return abs(value - self.published_value) > band
+
+    def _silence_exceeded(self, now):
+        if self.max_silence_ms is None or self.published_at is None:
+            return False
+        return time.ticks_diff(now, self.published_at) >= self.max_silence_ms
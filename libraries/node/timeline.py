@@ -0,0 +1,22 @@
+import time
+
+# Startup phases, as (phase, ms since boot) in the order they completed
+marks = []
+
+
+def mark(phase):
+    """ Record the given startup phase as completed now. Only the first completion of each phase is kept. """
+    for recorded, at in marks:
+        if recorded == phase:
+            return
+    marks.append((phase, time.ticks_ms()))
+
+
+def summary():
+    """ Get the timeline as text, giving when each phase completed and how long it took after the last """
+    parts = []
+    last = 0
+    for phase, at in marks:
+        parts.append('{} {}ms (+{}ms)'.format(phase, at, at - last))
+        last = at
+    return ', '.join(parts)
@@ -0,0 +1,151 @@
+import binascii
+import json
+import network
+import time
+import uasyncio as asyncio
+import config
+
+
+class WiFi:
+    """
+    Brings up the WiFi connection, checking its status at short intervals so it's used as soon as it's ready.
+    The access point's BSSID, and the DHCP lease details, are cached in flash so later connections can
+    join that access point directly, falling back to a normal connection if that fails.
+
+    A static IP can be set in config as `wifi_ifconfig = (ip, subnet, gateway, dns)` to skip DHCP.
+    Setting `wifi_reuse_lease = True` in config will instead skip DHCP by re-using the cached lease.
+    Only use that where the device has a DHCP reservation, since the address could otherwise have been
+    given to another device in the meantime.
+
+    Timings for the last connection, in ms, are kept in timings.
+    """
+
+    def __init__(self, power_save=True, country=None, timeout_ms=10000, cached_timeout_ms=5000, poll_ms=50,
+                 cache_file='wifi_cache'):
+        self.power_save = power_save
+        self.country = country
+        self.timeout_ms = timeout_ms
+        self.cached_timeout_ms = cached_timeout_ms
+        self.poll_ms = poll_ms
+        self.cache_file = cache_file
+        self.wlan = None
+        self.timings = {}
+        self._cache = None
+        self._started_at = None
+        self._join_started_at = None
+        self._bssid = None
+
+    def isconnected(self):
+        return self.wlan is not None and self.wlan.isconnected()
+
+    def start(self):
+        """
+        Start connecting, without waiting for the connection. Can be used to have the connection made
+        while other things are set up, with connect() then waiting for this attempt to complete.
+        """
+        self._started_at = time.ticks_ms()
+        if self.wlan is None:
+            self.wlan = self._activate()
+            self.timings['activate'] = time.ticks_diff(time.ticks_ms(), self._started_at)
+
+        cache = self._load_cache()
+        ifconfig = getattr(config, 'wifi_ifconfig', None)
+        if not ifconfig and getattr(config, 'wifi_reuse_lease', False):
+            ifconfig = cache.get('ifconfig')
+        if ifconfig:
+            self.wlan.ifconfig(tuple(ifconfig))
+
+        self._bssid = cache.get('bssid')
+        self._join(self._bssid)
+
+    async def connect(self):
+        if self._started_at is None:
+            self.start()
+
+        bssid = self._bssid
+        connected = await self._wait_for_join(self.cached_timeout_ms if bssid else self.timeout_ms)
+        if not connected and bssid:
+            print('Failed to connect via the cached access point, retrying without')
+            self.wlan.disconnect()
+            bssid = None
+            self._join(None)
+            connected = await self._wait_for_join(self.timeout_ms)
+
+        # Handle connection error
+        started_at = self._started_at
+        self._started_at = None
+        if not connected:
+            print('wlan status = ' + str(self.wlan.status()))
+            raise RuntimeError('network connection failed')
+
+        now = time.ticks_ms()
+        self.timings['join'] = time.ticks_diff(now, self._join_started_at)
+        self.timings['total'] = time.ticks_diff(now, started_at)
+        status = self.wlan.ifconfig()
+        print('connected in {}ms{}'.format(self.timings['total'], ' (cached access point)' if bssid else ''))
+        print('ip = ' + status[0])
+
+        self._update_cache(bssid, status)
+        if not bssid:
+            asyncio.create_task(self._cache_bssid())
+        return self.wlan
+
+    def _activate(self):
+        if self.country:
+            import rp2
+            rp2.country(self.country)
+
+        wlan = network.WLAN(network.STA_IF)
+        wlan.active(True)
+        if not self.power_save:
+            wlan.config(pm=0xa11140)  # Disable power-save mode
+        return wlan
+
+    def _join(self, bssid):
+        self._join_started_at = time.ticks_ms()
+        if bssid:
+            self.wlan.connect(config.wifi_ssid, config.wifi_pass, bssid=binascii.unhexlify(bssid))
+        else:
+            self.wlan.connect(config.wifi_ssid, config.wifi_pass)
+
+    async def _wait_for_join(self, timeout_ms):
+        # Wait for connect or fail
+        while time.ticks_diff(time.ticks_ms(), self._join_started_at) < timeout_ms:
+            status = self.wlan.status()
+            if status < 0 or status >= 3:
+                break
+            await asyncio.sleep_ms(self.poll_ms)
+        return self.wlan.status() == 3
+
+    async def _cache_bssid(self):
+        # Scanning blocks for a couple of seconds, so is only done when there's no cached access point,
+        # and after a delay so it doesn't hold up the rest of startup.
+        await asyncio.sleep_ms(30000)
+        if self.isconnected():
+            self._update_cache(self._find_bssid(), self.wlan.ifconfig())
+
+    def _find_bssid(self):
+        best = None
+        for ssid, bssid, channel, rssi, security, hidden in self.wlan.scan():
+            if ssid.decode() == config.wifi_ssid and (best is None or rssi > best[1]):
+                best = (bssid, rssi)
+        return binascii.hexlify(best[0]).decode() if best else None
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_file) as file:
+                    self._cache = json.load(file)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _update_cache(self, bssid, ifconfig):
+        cache = {
+            'bssid': bssid,
+            'ifconfig': list(ifconfig),
+        }
+        if cache != self._cache:
+            self._cache = cache
+            with open(self.cache_file, 'w') as file:
+                json.dump(cache, file)
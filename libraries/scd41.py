@@ -20,26 +20,80 @@ class instance and the instance will:
   - Otherwise provide cached results if last fetched in the last 5s.
   - Otherwise wait until the sensor has new results to fetch.
 
+The sensor can instead be ran in one of its lower power modes, by passing a mode when creating the instance:
+  - MODE_PERIODIC: The default, sensor measures every 5s.
+  - MODE_LOW_POWER_PERIODIC: Sensor measures every 30s.
+  - MODE_SINGLE_SHOT: Sensor idles, only measuring on request (taking 5s) no more often than interval_ms.
+SCD41.mode_for_interval(ms) will provide the cheapest mode which still provides new readings at the given rate:
+    thc_sensor = SCD41(i2c1, mode=SCD41.mode_for_interval(60000), interval_ms=60000)
+
 The sensor requires a 1000ms power-on time. This driver assumes power-on at time of initiation.
 If a reading is then requested, it will wait for the remainder time since initiation to ensure this time.
 Between power-on and sensor-read delays, your first request of sensor data may cause a delay of up to ~6500ms.
 
+Alternatively, when used within uasyncio, the measurement cycle can be ran as a background task:
+    asyncio.create_task(thc_sensor.run())
+    await thc_sensor.wait_for_reading()
+    print("co:", thc_sensor.carbon_dioxide)
+
+In this mode the task keeps the latest readings cached, fetching them from the sensor
+in line with its own measurement cycle, and requesting values returns at once without
+touching the I2C bus. None of the power-on/start/data-ready waits will block other tasks.
+
+Each response from the sensor is verified against its CRC-8 checksums. Corrupt responses are
+counted, via the crc_errors attribute, and discarded so a fresh reading is fetched instead.
+
+Commands and responses use preallocated buffers, with readings stored as plain integers, so that polling
+the sensor in a steady state does not allocate on the heap. Only requesting the float values allocates.
+
 While this sensor provides various interfaces for calibration and settings, this driver does not currently
 provide methods for those.
 """
 import utime
+import uasyncio as asyncio
+from libraries.crc8 import check_words
 
 
 class SCD41:
+    MODE_PERIODIC = 0
+    MODE_LOW_POWER_PERIODIC = 1
+    MODE_SINGLE_SHOT = 2
 
-    def __init__(self, i2c, address=0x62):
+    def __init__(self, i2c, address=0x62, mode=MODE_PERIODIC, interval_ms=300000):
         self._i2c = i2c
         self._address = address
         self._buf = bytearray(9)
-        self._readings = (0, 0, 0)  # co2, temp, rh
-        self._last_readings_at = utime.ticks_add(utime.ticks_ms(), -10000)
+        self._cmd = memoryview(self._buf)[0:2]  # Command window, avoids a slice allocation per command
+        # Raw integer readings from the sensor
+        self._co2 = 0
+        self._temp = 0
+        self._rh = 0
+        self._last_readings_at = utime.ticks_ms()
         self._started_at = utime.ticks_ms()
+        self._mode = mode
+        if mode == self.MODE_PERIODIC:
+            self._cycle_ms = 5000
+        elif mode == self.MODE_LOW_POWER_PERIODIC:
+            self._cycle_ms = 30000
+        else:
+            self._cycle_ms = max(interval_ms, 5000)
         self._measuring = False
+        self._running = False
+        self._reading_ready = asyncio.Event()
+        self.crc_errors = 0
+
+    @staticmethod
+    def mode_for_interval(interval_ms):
+        """
+        Get the cheapest measurement mode that still provides a new reading for every interval_ms.
+        Single shot mode is only used from 5 minute intervals, since that's the interval the
+        sensor's automatic self-calibration assumes for single shot measurements.
+        """
+        if interval_ms < 30000:
+            return SCD41.MODE_PERIODIC
+        if interval_ms < 300000:
+            return SCD41.MODE_LOW_POWER_PERIODIC
+        return SCD41.MODE_SINGLE_SHOT
 
     def _initiate_measurement(self):
         """
@@ -48,6 +102,7 @@ class SCD41:
         therefore wait the 1000ms time, required by the sensor, if that has not yet passed.
         We call 'stop_periodic_measurement' first as a form of soft-reset in the event the
         measurement mode is out of sync with this instance.
+        In single shot mode, the sensor is then left idle until a measurement is requested.
         """
         start_diff = utime.ticks_diff(utime.ticks_ms(), self._started_at)
         if start_diff < 1000:
@@ -55,20 +110,39 @@ class SCD41:
 
         self._stop_periodic_measurement()
         utime.sleep_ms(500)
-        self._start_periodic_measurement()
+        self._start_measurement()
         self._measuring = True
 
+    def _start_measurement(self):
+        """ Start the periodic measurement command for the current mode, if it uses one """
+        if self._mode == self.MODE_PERIODIC:
+            self._start_periodic_measurement()
+        elif self._mode == self.MODE_LOW_POWER_PERIODIC:
+            self._start_low_power_periodic_measurement()
+
     def _start_periodic_measurement(self):
         """ Send the command to start periodic measurement """
         self._buf[0] = 0x21
         self._buf[1] = 0xb1
-        self._i2c.writeto(self._address, self._buf[0:2])
+        self._i2c.writeto(self._address, self._cmd)
+
+    def _start_low_power_periodic_measurement(self):
+        """ Send the command to start low power periodic measurement """
+        self._buf[0] = 0x21
+        self._buf[1] = 0xac
+        self._i2c.writeto(self._address, self._cmd)
+
+    def _measure_single_shot(self):
+        """ Send the command to take a single measurement, which will be ready to read after 5000ms """
+        self._buf[0] = 0x21
+        self._buf[1] = 0x9d
+        self._i2c.writeto(self._address, self._cmd)
 
     def _stop_periodic_measurement(self):
         """ Send the command to stop periodic measurement """
         self._buf[0] = 0x3f
         self._buf[1] = 0x86
-        self._i2c.writeto(self._address, self._buf[0:2])
+        self._i2c.writeto(self._address, self._cmd)
 
     def _read_measurement(self):
         """
@@ -77,20 +151,24 @@ class SCD41:
         The values stored are raw integer values from the sensor data.
         Reading from the sensor clears its measurement buffer, so this should only be called
         if there is data ready to be read.
+        Returns False, leaving the existing readings in place, if the response failed its CRC checks.
         """
         self._buf[0] = 0xec
         self._buf[1] = 0x05
-        self._i2c.writeto(self._address, self._buf[0:2])
+        self._i2c.writeto(self._address, self._cmd)
         utime.sleep_ms(1)
         self._i2c.readfrom_into(self._address, self._buf)
         # Measure response is provided across 9 bytes like so:
         #  [2 co2 + 1 checksum] [2 temp + checksum] [2 rh + 1 checksum]
-        self._readings = (
-            self._buf[0] << 8 | self._buf[1],
-            self._buf[3] << 8 | self._buf[4],
-            self._buf[6] << 8 | self._buf[7],
-        )
+        if not check_words(self._buf, 3):
+            self.crc_errors += 1
+            return False
+        self._co2 = self._buf[0] << 8 | self._buf[1]
+        self._temp = self._buf[3] << 8 | self._buf[4]
+        self._rh = self._buf[6] << 8 | self._buf[7]
         self._last_readings_at = utime.ticks_ms()
+        self._reading_ready.set()
+        return True
 
     def _get_data_ready_status(self):
         """
@@ -98,12 +176,16 @@ class SCD41:
         Handles the status response, where the sensor will indicate if the data
         is NOT ready by providing the least significant 11 bits as all zeroes.
         The result is formatted to a boolean for easy usage.
+        A response which fails its CRC check is counted, then treated as not ready.
         """
         self._buf[0] = 0xe4
         self._buf[1] = 0xb8
-        self._i2c.writeto(self._address, self._buf[0:2])
+        self._i2c.writeto(self._address, self._cmd)
         utime.sleep_ms(1)
         self._i2c.readfrom_into(self._address, self._buf)
+        if not check_words(self._buf, 1):
+            self.crc_errors += 1
+            return False
         return bool(((self._buf[0] << 8) | self._buf[1]) & 0x7FF)
 
     def _poll_reading(self):
@@ -111,46 +193,122 @@ class SCD41:
         Poll for a next reading.
         This will initiate measurement if it has not already started.
         If the sensor has data ready, we fetch it to get up-to-date readings.
-        Otherwise, if the last sensor readings were recent (within the last 5s) then we
-        consider the sensor polled and up-to-date already.
+        Otherwise, if the last sensor readings were recent (within the last measurement cycle)
+        then we consider the sensor polled and up-to-date already.
         Otherwise, we'll wait until the sensor has data ready and then read it once available.
+        Corrupt readings are retried on the sensor's following measurement cycles, raising a
+        RuntimeError if none of the attempts give a valid reading.
+        In single shot mode, a new measurement is taken instead if the readings are not recent.
         """
         if not self._measuring:
             self._initiate_measurement()
 
+        if self._mode == self.MODE_SINGLE_SHOT:
+            if self._has_recent_reading():
+                return
+            for _ in range(3):
+                self._measure_single_shot()
+                utime.sleep_ms(5000)
+                if self._read_measurement():
+                    return
+            raise RuntimeError("SCD41 readings failed CRC checks")
+
         ready = self._get_data_ready_status()
-        if ready:
-            self._read_measurement()
+        if ready and self._read_measurement():
             return
 
-        time_diff = utime.ticks_diff(utime.ticks_ms(), self._last_readings_at)
-        if time_diff < 5000:
+        if self._has_recent_reading():
             return
 
-        while not self._get_data_ready_status():
-            utime.sleep_ms(100)
+        for _ in range(3):
+            while not self._get_data_ready_status():
+                utime.sleep_ms(100)
+            if self._read_measurement():
+                return
+
+        raise RuntimeError("SCD41 readings failed CRC checks")
+
+    def _has_recent_reading(self):
+        """ Check if readings have been fetched within the last measurement cycle """
+        if not self._reading_ready.is_set():
+            return False
+        return utime.ticks_diff(utime.ticks_ms(), self._last_readings_at) < self._cycle_ms
+
+    async def run(self):
+        """
+        Run the measurement cycle as a background task.
+        Starts measurement, without blocking, then fetches each new set of readings
+        as the sensor provides them. Checks are timed from the last fetch so they stay
+        aligned to the sensor's own cycle, falling back to 100ms re-checks if data is not yet ready.
+        In single shot mode, a measurement is instead requested every interval.
+        """
+        self._running = True
+        start_diff = utime.ticks_diff(utime.ticks_ms(), self._started_at)
+        if start_diff < 1000:
+            await asyncio.sleep_ms(1001 - start_diff)
+
+        self._stop_periodic_measurement()
+        await asyncio.sleep_ms(500)
+        self._start_measurement()
+        self._measuring = True
+
+        if self._mode == self.MODE_SINGLE_SHOT:
+            await self._run_single_shot()
+            return
+
+        next_check_at = utime.ticks_add(utime.ticks_ms(), self._cycle_ms)
+        while self._running:
+            wait = utime.ticks_diff(next_check_at, utime.ticks_ms())
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+
+            if self._get_data_ready_status():
+                # A corrupt reading is discarded, we'll then pick up the next cycle's reading instead
+                self._read_measurement()
+                next_check_at = utime.ticks_add(utime.ticks_ms(), self._cycle_ms)
+            else:
+                next_check_at = utime.ticks_add(utime.ticks_ms(), 100)
+
+    async def _run_single_shot(self):
+        """ Request and fetch single shot measurements every interval, keeping to the interval without drift """
+        next_measure_at = utime.ticks_ms()
+        while self._running:
+            wait = utime.ticks_diff(next_measure_at, utime.ticks_ms())
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+
+            self._measure_single_shot()
+            await asyncio.sleep_ms(5000)
+            self._read_measurement()
+            next_measure_at = utime.ticks_add(next_measure_at, self._cycle_ms)
 
-        self._read_measurement()
+    async def wait_for_reading(self):
+        """ Wait until readings have been fetched from the sensor. Returns at once if they already have """
+        await self._reading_ready.wait()
 
     def stop(self):
         """ Stops the sensor polling for measurements """
+        self._running = False
         self._stop_periodic_measurement()
         self._measuring = False
 
     @property
     def temperature(self):
         """ Get the temperature as a value in degrees centigrade """
-        self._poll_reading()
-        return (175 * (self._readings[1] / 65536)) - 45
+        if not self._running:
+            self._poll_reading()
+        return (175 * (self._temp / 65536)) - 45
 
     @property
     def relative_humidity(self):
         """ Get the relative humidity as a value in percent """
-        self._poll_reading()
-        return 100 * (self._readings[2] / 65536)
+        if not self._running:
+            self._poll_reading()
+        return 100 * (self._rh / 65536)
 
     @property
     def carbon_dioxide(self):
         """ Get the relative humidity as a value in ppm """
-        self._poll_reading()
-        return self._readings[0]
+        if not self._running:
+            self._poll_reading()
+        return self._co2
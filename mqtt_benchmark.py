@@ -0,0 +1,108 @@
+import machine
+import utime
+import uasyncio as asyncio
+from libraries.scd41 import SCD41
+from libraries.node import Node, Sensor, Filter
+
+# Compares the MQTT traffic of publishing each sensor's state separately against batched publishing,
+# in packets and bytes per hour. Runs the picow_b sensors, with the same wiring, for a while in each mode.
+# Needs a config.py, as the messages are sent to the real broker.
+
+run_time_ms = 30 * 60 * 1000
+
+m_sens = machine.Pin(7, machine.Pin.IN, machine.Pin.PULL_DOWN)
+i2c1 = machine.I2C(1, sda=machine.Pin(10), scl=machine.Pin(11), freq=100000)
+thc_sensor = SCD41(i2c1, mode=SCD41.MODE_LOW_POWER_PERIODIC)
+
+
+class CountingClient:
+    """ Wraps an MQTT client to count the PUBLISH packets sent, and their size """
+
+    def __init__(self, client):
+        self.client = client
+        self.packets = 0
+        self.bytes = 0
+
+    def publish(self, topic, msg, retain=False):
+        self.client.publish(topic, msg, retain)
+        if not topic.endswith(b'/state'):
+            return  # Only count states, not the boot timeline
+        # Fixed header byte, remaining length (1-2 bytes at these sizes), topic length prefix, topic & message
+        remaining = 2 + len(topic) + len(msg)
+        self.bytes += 1 + (1 if remaining < 128 else 2) + remaining
+        self.packets += 1
+
+
+def make_sensors():
+    climate = {'poll_rate_ms': 30000, 'max_silence_ms': 900000, 'refresh': thc_sensor.wait_for_reading}
+    return [
+        Sensor(
+            name='Benchmark Proximity',
+            id='benchmark_proximity',
+            type='binary_sensor',
+            status_getter=(lambda: 'ON' if m_sens.value() else 'OFF'),
+            device_class='motion',
+            irq_pin=m_sens,
+            poll_rate_ms=60000
+        ),
+        Sensor(
+            name='Benchmark Temperature',
+            id='benchmark_temp',
+            type='sensor',
+            status_getter=(lambda: thc_sensor.temperature),
+            device_class='temperature',
+            unit_of_measurement='°C',
+            value_format='%.2f',
+            deadband=0.1,
+            filter=Filter(),
+            **climate
+        ),
+        Sensor(
+            name='Benchmark Relative Humidity',
+            id='benchmark_rh',
+            type='sensor',
+            status_getter=(lambda: thc_sensor.relative_humidity),
+            device_class='humidity',
+            unit_of_measurement='%',
+            value_format='%.2f',
+            deadband=0.5,
+            filter=Filter(),
+            **climate
+        ),
+        Sensor(
+            name='Benchmark CO2',
+            id='benchmark_co2',
+            type='sensor',
+            status_getter=(lambda: thc_sensor.carbon_dioxide),
+            device_class='carbon_dioxide',
+            unit_of_measurement='ppm',
+            value_format='%d',
+            deadband=10,
+            deadband_ratio=0.02,
+            filter=Filter(),
+            **climate
+        ),
+    ]
+
+
+def benchmark(name, batch):
+    # Counts the state messages queued for sending. Configs are sent directly on connect, so aren't counted.
+    node = Node(device_name='Benchmark', sensors=make_sensors(), tasks=[thc_sensor.run], batch=batch)
+    client = CountingClient(node.mqtt)
+    node.publisher.client = client
+
+    asyncio.new_event_loop()
+    try:
+        asyncio.run(asyncio.wait_for_ms(node.run_async(), run_time_ms))
+    except asyncio.TimeoutError:
+        pass
+    thc_sensor.stop()
+
+    # Each packet also carries at least 40 bytes of TCP/IP headers
+    scale = 3600000 / run_time_ms
+    print("{}: {:.0f} packets/hour, {:.0f} MQTT bytes/hour, {:.0f} bytes/hour with TCP/IP headers".format(
+        name, client.packets * scale, client.bytes * scale, (client.bytes + client.packets * 40) * scale))
+
+
+benchmark("Per-sensor", False)
+benchmark("Batched", True)
@@ -1,12 +1,15 @@
-import json
 import machine
 import time
-import network
-from umqtt.simple import MQTTClient
-import config
+from libraries.node import timeline, WiFi
+
+# Start connecting to WiFi straight away, so it can connect while everything else starts up
+wifi = WiFi()
+wifi.start()
 
 from libraries.scd41 import SCD41
 from libraries.hd44780 import HD44780
+from libraries.node import Node, Sensor, Filter, OfflineLog
+timeline.mark('import')
 
 device_name = 'Picow B'
 device_id = device_name.lower().replace(' ', '_')
@@ -34,54 +37,18 @@ thc_sda = machine.Pin(10)  # thc = temp+humidity+CO2 (SCD41)
 thc_scl = machine.Pin(11)
 
 # Globals
-mqtt_client = None
+climate_poll_rate_ms = 30000  # Readings are oversampled & filtered, with publishing limited by deadbands
+climate_max_silence_ms = 900000  # Re-publish climate readings at least this often, even if unchanged
 
 # Busses & Sensor/Component Instances
 i2c1 = machine.I2C(1, sda=thc_sda, scl=thc_scl, freq=100000)
-thc_sensor = SCD41(i2c1)
+thc_sensor = SCD41(i2c1, mode=SCD41.mode_for_interval(climate_poll_rate_ms), interval_ms=climate_poll_rate_ms)
 display = HD44780(lcd_rs, lcd_enable, lcd_data4, lcd_data5, lcd_data6, lcd_data7)
+timeline.mark('driver init')
 
 
-# Wifi & MQTT
-
-def wifi_connect():
-    wlan = network.WLAN(network.STA_IF)
-    wlan.active(True)
-    # wlan.config(pm=0xa11140)  # Disable power-save mode
-    wlan.connect(config.wifi_ssid, config.wifi_pass)
-    # Wait for connect or fail
-    max_wait = 10
-    while max_wait > 0:
-        if wlan.status() < 0 or wlan.status() >= 3:
-            break
-        max_wait -= 1
-        print('waiting for connection...')
-        time.sleep(1)
-
-    # Handle connection error
-    if wlan.status() != 3:
-        raise RuntimeError('network connection failed')
-    else:
-        print('connected')
-        status = wlan.ifconfig()
-        print('ip = ' + status[0])
-
-
-def mqtt_connect():
-    client = MQTTClient(
-        device_id,
-        config.mqtt_server,
-        keepalive=3600,
-        user=config.mqtt_user,
-        password=config.mqtt_pass
-    )
-    client.connect(True)
-    print('Connected to %s MQTT Broker' % (config.mqtt_server))
-    return client
-
-
-def reconnect():
-    print('Failed to connect to the MQTT Broker. Reconnecting...')
+def reset(err):
+    print('Failed with error. Resetting...')
     time.sleep(5)
     machine.reset()
 
@@ -131,70 +98,14 @@ r_led.on()
 lcd_led_pow.on()
 
 
-# Sensor logic
-
-
-def update_sensor_mqtt_state(sensor):
-    state_topic = 'homeassistant/{type}/{id}/state'.format(type=sensor.type, id=sensor.id)
-    mqtt_client.publish(state_topic.encode(), sensor.status.encode())
-
-
-def update_sensor_mqtt_config(sensor):
-    state_topic = 'homeassistant/{type}/{id}/state'.format(type=sensor.type, id=sensor.id)
-    config_topic = 'homeassistant/{type}/{id}/config'.format(type=sensor.type, id=sensor.id)
-    configure_payload = {
-        "name": sensor.name,
-        "state_topic": state_topic,
-        "unique_id": sensor.id,
-        "device": {
-            "name": device_name,
-            "identifiers": [device_id]
-        }
-    }
-
-    if sensor.device_class:
-        configure_payload["device_class"] = sensor.device_class
-
-    if sensor.unit_of_measurement:
-        configure_payload["unit_of_measurement"] = sensor.unit_of_measurement
-
-    mqtt_client.publish(config_topic.encode(), json.dumps(configure_payload).encode())
-
-
-def update_sensor(sensor):
-    changed = sensor.check_status()
-    # print("Check sensor status, sensor: {sensor}, status: {status}, changed: {changed}".format(sensor=sensor.id,status=str(sensor.status), changed=str(changed)))
-    if changed:
-        update_sensor_mqtt_state(sensor)
-
-
-class Sensor:
-
-    def __init__(self, name, id, type, status_getter, device_class='', unit_of_measurement='', poll_rate_ms=1000):
-        self.name = name
-        self.id = id
-        self.type = type  # https://www.home-assistant.io/integrations/mqtt/#mqtt-discovery
-        self.status_getter = status_getter
-        self.device_class = device_class  # https://www.home-assistant.io/integrations/sensor/#device-class
-        self.poll_rate_ms = poll_rate_ms
-        self.status = None
-        self.on_change_handlers = []
-        self.unit_of_measurement = unit_of_measurement
-
-    def check_status(self):
-        status = self.status_getter()
-        changed = status != self.status
-        if changed:
-            self.status = status
-            for handler in self.on_change_handlers:
-                handler(status, self)
-        return changed
+# Sensor Configuration
 
-    def add_on_change_handler(self, handler):
-        self.on_change_handlers.append(handler)
 
+def show_proximity(val, sensor):
+    # Show the proximity sensor state via white LED
+    w_led.value(lights_enabled and val == 'ON')
+    print("Proximity:" + val)
 
-# Sensor Configuration
 
 proximity_sensor = Sensor(
     name=device_name + ' Proximity',
@@ -202,59 +113,125 @@ proximity_sensor = Sensor(
     type='binary_sensor',
     status_getter=(lambda: 'ON' if m_sens.value() else 'OFF'),
     device_class='motion',
-    poll_rate_ms=500
+    irq_pin=m_sens,
+    poll_rate_ms=60000,
+    on_change=show_proximity
 )
 
 temp_sensor = Sensor(
     name=device_name + ' Temperature',
     id=device_id + '_temp',
     type='sensor',
-    status_getter=(lambda: ("%.2f" % thc_sensor.temperature)),
+    status_getter=(lambda: thc_sensor.temperature),
+    value_format='%.2f',
+    deadband=0.1,
+    max_silence_ms=climate_max_silence_ms,
+    filter=Filter(),
     device_class='temperature',
-    poll_rate_ms=60000,
-    unit_of_measurement='°C'
+    poll_rate_ms=climate_poll_rate_ms,
+    unit_of_measurement='°C',
+    refresh=thc_sensor.wait_for_reading
 )
 
 humidity_sensor = Sensor(
     name=device_name + ' Relative Humidity',
     id=device_id + '_rh',
     type='sensor',
-    status_getter=(lambda: ("%.2f" % thc_sensor.relative_humidity)),
+    status_getter=(lambda: thc_sensor.relative_humidity),
+    value_format='%.2f',
+    deadband=0.5,
+    max_silence_ms=climate_max_silence_ms,
+    filter=Filter(),
     device_class='humidity',
-    poll_rate_ms=60000,
-    unit_of_measurement='%'
+    poll_rate_ms=climate_poll_rate_ms,
+    unit_of_measurement='%',
+    refresh=thc_sensor.wait_for_reading
 )
 
 carbon_dioxide_sensor = Sensor(
     name=device_name + ' CO2',
     id=device_id + '_co2',
     type='sensor',
-    status_getter=(lambda: ("%d" % thc_sensor.carbon_dioxide)),
+    status_getter=(lambda: thc_sensor.carbon_dioxide),
+    value_format='%d',
+    deadband=10,
+    deadband_ratio=0.02,
+    max_silence_ms=climate_max_silence_ms,
+    filter=Filter(),
     device_class='carbon_dioxide',
-    poll_rate_ms=60000,
-    unit_of_measurement='ppm'
+    poll_rate_ms=climate_poll_rate_ms,
+    unit_of_measurement='ppm',
+    refresh=thc_sensor.wait_for_reading
 )
 
-# List to hold all our sensors
-sensors = [proximity_sensor, temp_sensor, humidity_sensor, carbon_dioxide_sensor]
 
-# Show the proximity sensor state via green LED
-proximity_sensor.add_on_change_handler((lambda val, sensor: w_led.value(lights_enabled and val == 'ON')))
-proximity_sensor.add_on_change_handler((lambda val, sensor: print("Proximity:" + val)))
+# Display handling logic
+# Custom display characters, as 5x8 pixel rows, loaded into the display's CGRAM slots.
+GLYPH_SLOT_MOTION = 0
+GLYPH_SLOT_LIGHTS = 1
+GLYPH_SLOT_CO2_TREND = 2
+GLYPH_SLOT_WIFI = 3
+
+GLYPH_MOTION = bytes((0b01100, 0b01100, 0b00000, 0b01110, 0b11100, 0b01100, 0b11010, 0b10011))
+GLYPH_LIGHTS = bytes((0b01110, 0b10001, 0b10001, 0b10001, 0b01010, 0b01110, 0b01110, 0b00100))
+GLYPH_TREND_UP = bytes((0b00100, 0b01110, 0b10101, 0b00100, 0b00100, 0b00100, 0b00100, 0b00000))
+GLYPH_TREND_DOWN = bytes((0b00000, 0b00100, 0b00100, 0b00100, 0b00100, 0b10101, 0b01110, 0b00100))
+GLYPH_TREND_STEADY = bytes((0b00000, 0b00100, 0b00010, 0b11111, 0b00010, 0b00100, 0b00000, 0b00000))
+GLYPHS_WIFI = (  # By signal strength, 0-3 bars
+    bytes((0b00000, 0b00000, 0b00000, 0b00000, 0b00000, 0b00000, 0b00000, 0b10000)),
+    bytes((0b00000, 0b00000, 0b00000, 0b00000, 0b00000, 0b10000, 0b10000, 0b10000)),
+    bytes((0b00000, 0b00000, 0b00000, 0b00100, 0b00100, 0b10100, 0b10100, 0b10100)),
+    bytes((0b00001, 0b00001, 0b00001, 0b00101, 0b00101, 0b10101, 0b10101, 0b10101)),
+)
 
+display.define_glyph(GLYPH_SLOT_MOTION, GLYPH_MOTION)
+display.define_glyph(GLYPH_SLOT_LIGHTS, GLYPH_LIGHTS)
 
-# Display handling logic
 last_display_str = ""
+co2_trend_glyph = GLYPH_TREND_STEADY
+
+
+def track_co2_trend(val, sensor):
+    global co2_trend_glyph
+    if sensor.last_status is None or val == sensor.last_status:
+        co2_trend_glyph = GLYPH_TREND_STEADY
+    else:
+        co2_trend_glyph = GLYPH_TREND_UP if int(val) > int(sensor.last_status) else GLYPH_TREND_DOWN
+
+
+carbon_dioxide_sensor.add_on_change_handler(track_co2_trend)
+
+
+def get_wifi_bars():
+    if node.wlan is None or not node.wlan.isconnected():
+        return 0
+    rssi = node.wlan.status('rssi')
+    if rssi > -60:
+        return 3
+    if rssi > -70:
+        return 2
+    return 1 if rssi > -80 else 0
+
+
+def format_reading(value, format_str):
+    # Sensors not yet read are shown as dashes, rather than failing to format
+    return '--' if value is None else format_str.format(value)
 
 
 def update_display_with_sensor_status():
     global last_display_str
-    display_str = "T {0:.1f}, RH {1:.1f}\nCO2 {2}ppm   {3}{4}".format(
-        float(temp_sensor.status),
-        float(humidity_sensor.status),
-        carbon_dioxide_sensor.status,
-        "\x21" if (proximity_sensor.status is "ON") else " ",
-        "\x2A" if lights_enabled else " "
+
+    # Glyph definitions are cached by the driver, so these only hit the display when changed
+    display.define_glyph(GLYPH_SLOT_CO2_TREND, co2_trend_glyph)
+    display.define_glyph(GLYPH_SLOT_WIFI, GLYPHS_WIFI[get_wifi_bars()])
+
+    display_str = "T {0}, RH {1}\n{2:<13}{3}{4}{5}".format(
+        format_reading(temp_sensor.value, "{:.1f}"),
+        format_reading(humidity_sensor.value, "{:.1f}"),
+        "CO2 {0}ppm{1}".format(format_reading(carbon_dioxide_sensor.status, "{}"), chr(GLYPH_SLOT_CO2_TREND)),
+        chr(GLYPH_SLOT_WIFI),
+        chr(GLYPH_SLOT_MOTION) if (proximity_sensor.status == "ON") else " ",
+        chr(GLYPH_SLOT_LIGHTS) if lights_enabled else " "
     )
 
     if display_str != last_display_str:
@@ -262,50 +239,18 @@ def update_display_with_sensor_status():
         display.write(display_str)
 
 
-try:
-    wifi_connect()
-    mqtt_client = mqtt_connect()
-    sensor_check_times = []
-    last_sys_led_change = time.ticks_ms()
-
-    # Update sensor config
-    for sensor in sensors:
-        update_sensor_mqtt_config(sensor)
-        update_sensor(sensor)
-        sensor_check_times.append(time.ticks_ms())
-
-    # Poll sensors
-    while True:
-        time.sleep(1)
-        now = time.ticks_ms()
-        sensor_next_polls = []
-
-        # Toggle sys led to indicate activity, limited to half-second changes at minimum
-        # so flashing is visible.
-        if lights_enabled and time.ticks_diff(now, last_sys_led_change) > 200:
-            sys_led.value(not sys_led.value())
-            last_sys_led_change = time.ticks_ms()
-
-        # We update each sensor, if it's time, and store the expected time
-        # until we next need to poll the sensor.
-        for index, sensor in enumerate(sensors):
-            last_check = sensor_check_times[index]
-            check_delta = time.ticks_diff(now, last_check)
-            time_to_poll = sensor.poll_rate_ms - check_delta
-            # print("check for {}, delta: {}, poll_rate: {}, ttp: {}".format(sensor.id, check_delta, sensor.poll_rate_ms, time_to_poll))
-            if time_to_poll <= 0:
-                update_sensor(sensor)
-                time_to_poll = sensor.poll_rate_ms
-                sensor_check_times[index] = now
-            sensor_next_polls.append(time_to_poll)
-
-        # Update the LCD to current sensor status
-        update_display_with_sensor_status()
-
-        # We look to the minimum next poll and attempt to sleep until then
-        next_poll = min(sensor_next_polls)
-        if next_poll > 0:
-            time.sleep_ms(next_poll)
-
-except OSError as e:
-    reconnect()
+node = Node(
+    device_name=device_name,
+    sensors=[proximity_sensor, temp_sensor, humidity_sensor, carbon_dioxide_sensor],
+    # Run the SCD41 measurement cycle in the background so its waits don't block polling
+    tasks=[thc_sensor.run],
+    on_tick=update_display_with_sensor_status,
+    on_error=reset,
+    activity_led=sys_led,
+    activity_enabled=(lambda: lights_enabled),
+    # Keep climate readings taken while offline, to send once back online
+    offline_log=OfflineLog(),
+    wifi=wifi,
+)
+
+node.run()
@@ -0,0 +1,20 @@
+"""
+Host-side simulation of the devices, so the firmware can be ran, tested & profiled with CPython, without a Pico.
+
+Device scripts run unmodified, with stand-ins for the MicroPython modules (machine, utime, uasyncio, network,
+rp2, ntptime & umqtt) backed by models of the attached hardware, the WiFi network & the MQTT broker.
+Everything runs in virtual time, which only moves when the firmware sleeps or waits, so a simulated day
+takes seconds. For example:
+    from sim import simulate
+    sim = simulate('picow_a')
+    sim.outage(ms=600000, duration_ms=120000)
+    sim.run(ms=3600000)
+    print(sim.broker.payloads('homeassistant/sensor/picow_a_temp/state'))
+
+Or from the command line, to get a summary of a run:
+    python3 -m sim picow_b --minutes 60
+"""
+
+from sim.boards import simulate
+from sim.clock import SimulationEnd
+from sim.simulation import Simulation
@@ -0,0 +1,37 @@
+import argparse
+from sim.boards import boards, simulate
+
+parser = argparse.ArgumentParser(prog='python3 -m sim', description='Run a device in simulated time')
+parser.add_argument('device', choices=sorted(boards))
+parser.add_argument('--minutes', type=float, default=60, help='Simulated time to run for')
+parser.add_argument('--seed', type=int, default=0, help='Seed for the scripted readings & motion')
+parser.add_argument('--outage', type=float, nargs=2, metavar=('AT_MINUTES', 'FOR_MINUTES'),
+                    help='Take the WiFi network down for a while')
+parser.add_argument('--ticks-start-ms', type=int, default=0, help='Start ticks here, such as close to them wrapping')
+parser.add_argument('--verbose', action='store_true', help='Show what the device prints, as it runs')
+args = parser.parse_args()
+
+sim = simulate(args.device, seed=args.seed, ticks_start_ms=args.ticks_start_ms)
+if args.outage:
+    sim.outage(args.outage[0] * 60000, args.outage[1] * 60000)
+sim.run(args.minutes * 60000, verbose=args.verbose)
+
+messages = sim.broker.messages
+states = [message for message in messages if message.topic.endswith('/state')]
+print('{}: {:.0f} simulated minutes in {:.2f}s ({:.0f}x)'.format(
+    args.device, sim.seconds() / 60, sim.host_seconds, sim.seconds() / max(sim.host_seconds, 1e-9)))
+print('Boots: {}, resets: {}, MQTT connects: {}, WiFi joins: {}'.format(
+    sim.boots, sim.resets, sim.broker.connects, sim.network.joins))
+print('First state published at: {}'.format('{}ms'.format(states[0].at_ms) if states else 'never'))
+print('Messages: {} ({} payload bytes)'.format(len(messages), sum(len(message.payload) for message in messages)))
+for topic, count in sorted(sim.broker.topics().items()):
+    print('  {}: {}'.format(topic, count))
+for name in ('aht20', 'scd41'):
+    device = getattr(sim, name, None)
+    if device:
+        print('{}: {} measurements, {} I2C writes, {} reads'.format(name, device.measurements, device.writes, device.reads))
+display = getattr(sim, 'display', None)
+if display:
+    print('Display: {} bytes sent, {} timing violations'.format(display.bytes, display.timing_violations))
+    for line in display.lines:
+        print('  |{}|'.format(''.join(char if ' ' <= char <= '~' else '?' for char in line)))
@@ -0,0 +1,58 @@
+"""
+The hardware of each device, wired as in its main.py, with scripted readings & inputs.
+Readings follow a daily cycle with some noise, and motion is seen now & then, so a run looks like a normal day.
+"""
+
+import os
+import random
+from sim.devices import AHT20, SCD41, HD44780, cycle
+from sim.simulation import Simulation, repo_root
+
+
+def motion(sim, pin, mean_gap_ms=600000, mean_presence_ms=60000, seed=0):
+    """ Drive a motion sensor's pin high for random periods, at random intervals """
+    rng = random.Random(seed)
+
+    def arrive():
+        sim.pin(pin).set(1)
+        sim.at(sim.clock.now_us / 1000 + rng.expovariate(1 / mean_presence_ms), leave)
+
+    def leave():
+        sim.pin(pin).set(0)
+        sim.at(sim.clock.now_us / 1000 + rng.expovariate(1 / mean_gap_ms), arrive)
+
+    sim.at(rng.expovariate(1 / mean_gap_ms), arrive)
+
+
+def picow_a(sim, seed=0):
+    # main.py applies a -5°C offset, to account for the sensor sitting warm in its housing
+    sim.aht20 = sim.add_i2c_device(0, AHT20(
+        sim,
+        temperature=cycle(26, 2, noise=0.05, seed=seed),
+        humidity=cycle(50, 8, noise=0.3, seed=seed + 1),
+    ))
+    motion(sim, 18, seed=seed + 2)
+
+
+def picow_b(sim, seed=0):
+    sim.scd41 = sim.add_i2c_device(1, SCD41(
+        sim,
+        co2=cycle(800, 300, noise=15, seed=seed),
+        temperature=cycle(21, 2, noise=0.05, seed=seed + 1),
+        humidity=cycle(45, 8, noise=0.3, seed=seed + 2),
+    ))
+    sim.display = sim.add_device(HD44780(sim, rs=28, enable=27, data4=26, data5=22, data6=21, data7=20))
+    motion(sim, 7, seed=seed + 3)
+
+
+boards = {
+    'picow_a': picow_a,
+    'picow_b': picow_b,
+}
+
+
+def simulate(device, seed=0, **kwargs):
+    """ Get a Simulation of the given device (picow_a or picow_b), running its main.py """
+    sim = Simulation(os.path.join(repo_root, device, 'main.py'), **kwargs)
+    boards[device](sim, seed)
+    return sim
@@ -0,0 +1,79 @@
+import heapq
+import math
+
+# MicroPython's ticks wrap at 2^30 on the rp2 port
+TICKS_PERIOD = 1 << 30
+TICKS_MASK = TICKS_PERIOD - 1
+
+# Where the Pico's RTC starts from on boot, before it's set via NTP (2021-01-01)
+RTC_BOOT_EPOCH = 1609459200
+
+
+class SimulationEnd(SystemExit):
+    """
+    Raised once the simulation reaches its end time.
+    A SystemExit so neither the firmware's error handling, nor asyncio's task handling, will catch it.
+    """
+
+
+class Clock:
+    """
+    Virtual time for a simulation, in microseconds since it started. The ticks & RTC restart on each boot.
+    Time only moves when the firmware sleeps, or waits on the event loop, so a simulated hour takes as long
+    as the code ran for within it. Callbacks can be scheduled to run at a given time, such as to drive input
+    pins, and run as soon as time reaches them, including part way through a blocking sleep.
+    """
+
+    def __init__(self, ticks_start_ms=0):
+        self.now_us = 0
+        self.end_us = None
+        self.ticks_start_us = ticks_start_ms * 1000
+        self.boot_us = 0
+        self.rtc_boot_s = RTC_BOOT_EPOCH
+        self._events = []
+        self._event_count = 0
+
+    def boot(self):
+        self.boot_us = self.now_us
+        self.rtc_boot_s = RTC_BOOT_EPOCH
+
+    def since_boot_us(self):
+        return self.now_us - self.boot_us
+
+    def ticks_ms(self):
+        return ((self.ticks_start_us + self.since_boot_us()) // 1000) & TICKS_MASK
+
+    def ticks_us(self):
+        return (self.ticks_start_us + self.since_boot_us()) & TICKS_MASK
+
+    def time(self):
+        """ Get the RTC time, in seconds since the epoch """
+        return self.rtc_boot_s + self.since_boot_us() // 1000000
+
+    def set_time(self, epoch_s):
+        self.rtc_boot_s = epoch_s - self.since_boot_us() // 1000000
+
+    def at(self, at_us, callback):
+        """ Run the given callback once time reaches at_us """
+        heapq.heappush(self._events, (at_us, self._event_count, callback))
+        self._event_count += 1
+
+    def next_event_us(self):
+        return self._events[0][0] if self._events else None
+
+    def advance(self, us):
+        self.advance_to(self.now_us + math.ceil(us))
+
+    def advance_to(self, at_us):
+        while self._events and self._events[0][0] <= at_us:
+            event_at, _, callback = heapq.heappop(self._events)
+            self._check_end(event_at)
+            self.now_us = max(self.now_us, event_at)
+            callback()
+        self._check_end(at_us)
+        self.now_us = max(self.now_us, at_us)
+
+    def _check_end(self, at_us):
+        if self.end_us is not None and at_us > self.end_us:
+            self.now_us = self.end_us
+            raise SimulationEnd()
@@ -0,0 +1,281 @@
+"""
+Models of the hardware attached to the Picos, for the simulation to run the drivers against.
+Readings can be given as a plain value, or as a function of the simulated time in seconds (such as via cycle()).
+Each model counts the bus traffic it sees, which can be checked when profiling a driver.
+"""
+
+import math
+import random
+
+
+def cycle(mean, amplitude, period_s=86400, noise=0.0, seed=0):
+    """ Get a reading script following a sine wave over period_s, with optional gaussian noise """
+    rng = random.Random(seed)
+
+    def reading(t):
+        value = mean + amplitude * math.sin(2 * math.pi * t / period_s)
+        return value + rng.gauss(0, noise) if noise else value
+    return reading
+
+
+def sample(reading, t):
+    return reading(t) if callable(reading) else reading
+
+
+def crc8(data):
+    crc = 0xFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x31) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class PinState:
+    """
+    The level of a GPIO, shared by all machine.Pin instances for it.
+    Listeners are called with (pin_state, previous_level) on each change, which is how models watch outputs.
+    """
+
+    def __init__(self, id):
+        self.id = id
+        self.value = 0
+        self.irq = None
+        self.listeners = []
+
+    def set(self, value):
+        value = 1 if value else 0
+        previous = self.value
+        self.value = value
+        if value == previous:
+            return
+        for listener in self.listeners:
+            listener(self, previous)
+        if self.irq:
+            handler, trigger, pin = self.irq
+            if trigger & (8 if value else 4):  # Pin.IRQ_RISING / Pin.IRQ_FALLING
+                handler(pin)
+
+
+class AHT20:
+    """ AHT20 temperature & humidity sensor, taking 80ms per measurement """
+
+    address = 0x38
+    conversion_us = 80000
+
+    def __init__(self, sim, temperature=21.0, humidity=50.0):
+        self.sim = sim
+        self.temperature = temperature
+        self.humidity = humidity
+        self.calibrated = False
+        self.measuring_until = None
+        self.corrupt = 0  # Number of upcoming measurements to corrupt, to exercise CRC handling
+        self.writes = 0
+        self.reads = 0
+        self.measurements = 0
+        self._frame = bytearray(7)
+        self._corrupt_frame = False
+
+    def write(self, data):
+        self.writes += 1
+        if data[0] == 0xBA:
+            self.calibrated = False
+        elif data[0] == 0xBE:
+            self.calibrated = True
+        elif data[0] == 0xAC:
+            self.measuring_until = self.sim.clock.now_us + self.conversion_us
+            self._measure()
+
+    def read_into(self, buf):
+        self.reads += 1
+        busy = self.measuring_until is not None and self.sim.clock.now_us < self.measuring_until
+        frame = self._frame
+        frame[0] = (0x80 if busy else 0) | (0x08 if self.calibrated else 0) | 0x10
+        frame[6] = crc8(frame[:6]) ^ (0xFF if self._corrupt_frame else 0)
+        for i in range(min(len(buf), len(frame))):
+            buf[i] = frame[i]
+
+    def _measure(self):
+        self.measurements += 1
+        self._corrupt_frame = self.corrupt > 0
+        if self._corrupt_frame:
+            self.corrupt -= 1
+        t = self.sim.seconds()
+        humidity = min(max(int(sample(self.humidity, t) / 100 * 0x100000), 0), 0xFFFFF)
+        temperature = min(max(int((sample(self.temperature, t) + 50) / 200 * 0x100000), 0), 0xFFFFF)
+        self._frame[1] = humidity >> 12
+        self._frame[2] = (humidity >> 4) & 0xFF
+        self._frame[3] = ((humidity & 0xF) << 4) | (temperature >> 16)
+        self._frame[4] = (temperature >> 8) & 0xFF
+        self._frame[5] = temperature & 0xFF
+
+
+class SCD41:
+    """ SCD41 CO2, temperature & humidity sensor, in its periodic, low power periodic & single shot modes """
+
+    address = 0x62
+    periodic_us = 5000000
+    low_power_periodic_us = 30000000
+    single_shot_us = 5000000
+
+    def __init__(self, sim, co2=600, temperature=21.0, humidity=50.0):
+        self.sim = sim
+        self.co2 = co2
+        self.temperature = temperature
+        self.humidity = humidity
+        self.interval_us = None  # Set while measuring periodically
+        self.next_measurement_at = None
+        self.single_shot_at = None
+        self.ready = False
+        self.corrupt = 0  # Number of upcoming measurement reads to corrupt, to exercise CRC handling
+        self.commands = []
+        self.writes = 0
+        self.reads = 0
+        self.measurements = 0
+        self._command = None
+        self._words = (0, 0, 0)
+
+    def write(self, data):
+        self.writes += 1
+        self._update()
+        command = (data[0] << 8) | data[1]
+        self._command = command
+        self.commands.append(command)
+        now = self.sim.clock.now_us
+        if command == 0x21B1:
+            self.interval_us = self.periodic_us
+            self.next_measurement_at = now + self.interval_us
+        elif command == 0x21AC:
+            self.interval_us = self.low_power_periodic_us
+            self.next_measurement_at = now + self.interval_us
+        elif command == 0x3F86:
+            self.interval_us = None
+            self.next_measurement_at = None
+        elif command == 0x219D:
+            self.single_shot_at = now + self.single_shot_us
+
+    def read_into(self, buf):
+        self.reads += 1
+        self._update()
+        if self._command == 0xE4B8:
+            data = self._encode([0x8006 if self.ready else 0x8000])
+        elif self._command == 0xEC05:
+            data = self._encode(self._words)
+            self.ready = False
+            if self.corrupt:
+                self.corrupt -= 1
+                data[1] ^= 1
+        else:
+            data = bytearray(9)
+        for i in range(min(len(buf), len(data))):
+            buf[i] = data[i]
+
+    def _update(self):
+        # Take any measurements due by now
+        now = self.sim.clock.now_us
+        while self.next_measurement_at is not None and self.next_measurement_at <= now:
+            self._measure()
+            self.next_measurement_at += self.interval_us
+        if self.single_shot_at is not None and self.single_shot_at <= now:
+            self._measure()
+            self.single_shot_at = None
+
+    def _measure(self):
+        self.measurements += 1
+        self.ready = True
+        t = self.sim.seconds()
+        self._words = (
+            min(max(int(sample(self.co2, t)), 0), 0xFFFF),
+            min(max(int((sample(self.temperature, t) + 45) * 65536 / 175), 0), 0xFFFF),
+            min(max(int(sample(self.humidity, t) * 65536 / 100), 0), 0xFFFF),
+        )
+
+    @staticmethod
+    def _encode(words):
+        data = bytearray()
+        for word in words:
+            pair = bytes([word >> 8, word & 0xFF])
+            data += pair + bytes([crc8(pair)])
+        return data
+
+
+class HD44780:
+    """
+    16x2 HD44780 display, driven in 4-bit mode. Decodes the traffic on its pins to keep the display contents.
+    Commands sent before the last has had its execution time are counted in timing_violations.
+    Each byte received after initialization is kept in received, as (rs, byte).
+    """
+
+    command_us = 37
+    clear_us = 1520
+
+    def __init__(self, sim, rs, enable, data4, data5, data6, data7):
+        self.sim = sim
+        self.pins = [sim.pin(id) for id in (rs, data4, data5, data6, data7)]
+        sim.pin(enable).listeners.append(self._on_enable)
+        self.ddram = bytearray(b' ' * 0x80)
+        self.cgram = bytearray(64)
+        self.address = 0
+        self.cgram_mode = False
+        self.initialized = False
+        self.bytes = 0
+        self.clears = 0
+        self.timing_violations = 0
+        self.received = []
+        self._init_nibbles = 0
+        self._high = None
+        self._busy_until = 0
+
+    def boot(self):
+        # The driver re-sends the initialisation sequence when the Pico restarts, which resyncs the nibbles
+        self._init_nibbles = 0
+        self._high = None
+
+    @property
+    def lines(self):
+        return [
+            bytes(self.ddram[0x00:0x10]).decode('latin-1'),
+            bytes(self.ddram[0x40:0x50]).decode('latin-1'),
+        ]
+
+    def _on_enable(self, pin, previous):
+        # Data is latched on the falling edge of enable
+        if pin.value or not previous:
+            return
+        rs, d4, d5, d6, d7 = (state.value for state in self.pins)
+        nibble = d4 | d5 << 1 | d6 << 2 | d7 << 3
+
+        if self._init_nibbles < 4:
+            # The first nibbles are 8-bit mode function sets, with the last switching to 4-bit mode
+            self._init_nibbles += 1
+            self.initialized = self._init_nibbles == 4
+            return
+
+        if self._high is None:
+            if self.sim.clock.now_us < self._busy_until:
+                self.timing_violations += 1
+            self._high = nibble
+            return
+        byte = self._high << 4 | nibble
+        self._high = None
+        self.bytes += 1
+        self.received.append((rs, byte))
+        self._busy_until = self.sim.clock.now_us + (self.clear_us if not rs and byte < 0x04 else self.command_us)
+
+        if rs:
+            if self.cgram_mode:
+                self.cgram[self.address & 0x3F] = byte
+            else:
+                self.ddram[self.address & 0x7F] = byte
+            self.address += 1
+        elif byte == 0x01:
+            self.ddram[:] = b' ' * 0x80
+            self.address = 0
+            self.cgram_mode = False
+            self.clears += 1
+        elif byte & 0x80:
+            self.address = byte & 0x7F
+            self.cgram_mode = False
+        elif byte & 0x40:
+            self.address = byte & 0x3F
+            self.cgram_mode = True
@@ -0,0 +1,4 @@
+"""
+Stand-ins for the MicroPython modules used by the firmware, installed in place of the real ones while a
+simulation runs. Only what the firmware uses is provided.
+"""
@@ -0,0 +1,117 @@
+"""
+machine.Pin & machine.I2C, backed by the simulation's pin states and device models.
+I2C transfers take the time they would on the bus at the given frequency.
+"""
+
+from sim import simulation
+from sim.clock import SimulationEnd
+
+
+class MachineReset(SystemExit):
+    """ Raised by machine.reset(), ending the current boot of the simulation. A SystemExit like SimulationEnd """
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+        self.id = id
+        self._state = simulation.active.pin(id)
+        if value is not None:
+            self._state.set(value)
+
+    def init(self, mode=-1, pull=-1, value=None, **kwargs):
+        if value is not None:
+            self._state.set(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._state.value
+        self._state.set(value)
+
+    __call__ = value
+
+    def on(self):
+        self._state.set(1)
+
+    def off(self):
+        self._state.set(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self._state.set(not self._state.value)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._state.irq = (handler, trigger, self) if handler else None
+
+    def __repr__(self):
+        return 'Pin({!r})'.format(self.id)
+
+
+class I2C:
+
+    def __init__(self, id, scl=None, sda=None, freq=400000, timeout=50000):
+        self.id = id
+        self.freq = freq
+
+    def _device(self, address):
+        device = simulation.active.i2c_devices.get((self.id, address))
+        if device is None:
+            raise OSError(5, 'EIO')
+        return device
+
+    def _transfer(self, length):
+        # Address byte + data, 9 clocks (8 bits + ack) per byte
+        simulation.active.clock.advance((length + 1) * 9 * 1000000 / self.freq)
+
+    def scan(self):
+        return sorted(address for bus, address in simulation.active.i2c_devices if bus == self.id)
+
+    def writeto(self, address, buf, stop=True):
+        device = self._device(address)
+        self._transfer(len(buf))
+        device.write(bytes(buf))
+        return len(buf)
+
+    def readfrom_into(self, address, buf, stop=True):
+        device = self._device(address)
+        self._transfer(len(buf))
+        device.read_into(buf)
+
+    def readfrom(self, address, length, stop=True):
+        buf = bytearray(length)
+        self.readfrom_into(address, buf, stop)
+        return bytes(buf)
+
+
+def reset():
+    raise MachineReset()
+
+
+def soft_reset():
+    raise MachineReset()
+
+
+def unique_id():
+    return simulation.active.unique_id
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def idle():
+    clock = simulation.active.clock
+    next_event = clock.next_event_us()
+    if next_event is None:
+        raise SimulationEnd()
+    clock.advance_to(next_event)
@@ -0,0 +1,18 @@
+def const(value):
+    return value
+
+
+def native(function):
+    return function
+
+
+def viper(function):
+    return function
+
+
+def schedule(function, arg):
+    function(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
@@ -0,0 +1,89 @@
+"""
+network.WLAN for the Pico W, joining the simulation's network model.
+"""
+
+import binascii
+from sim import simulation
+from sim.network_model import (STAT_IDLE, STAT_CONNECTING, STAT_NOIP, STAT_GOT_IP, STAT_CONNECT_FAIL,
+                               STAT_NO_AP_FOUND, STAT_WRONG_PASSWORD)
+
+STA_IF = 0
+AP_IF = 1
+
+
+class WLAN:
+
+    def __init__(self, interface=STA_IF):
+        self._network = simulation.active.network
+        self._active = False
+        self._config = {'pm': 0xa11142, 'mac': simulation.active.unique_id[:6].ljust(6, b'\x00')}
+        self._static = None
+        self._connect_at = None
+        self._join_us = 0
+        self._access_point = None
+        self._failure = STAT_IDLE
+        self._generation = None
+        self._network.station = self
+
+    def active(self, active=None):
+        if active is None:
+            return self._active
+        self._active = bool(active)
+
+    def config(self, *args, **kwargs):
+        if args:
+            return self._config[args[0]]
+        self._config.update(kwargs)
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        if not self._active:
+            raise OSError(1, 'EPERM')
+        network = self._network
+        network.joins += 1
+        self._connect_at = network.sim.clock.now_us
+        self._join_us = (network.join_bssid_ms if bssid else network.join_ms) * 1000
+        self._generation = network.generation
+        self._access_point = network.find(ssid, bssid) if network.up else None
+        if self._access_point is None:
+            self._failure = STAT_NO_AP_FOUND
+        elif self._access_point.password != key:
+            self._failure = STAT_WRONG_PASSWORD
+        else:
+            self._failure = None
+
+    def disconnect(self):
+        self._connect_at = None
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return self._access_point.rssi if self.isconnected() else 0
+        if param is not None:
+            raise ValueError('unknown status param')
+        if self._connect_at is None:
+            return STAT_IDLE
+        elapsed = self._network.sim.clock.now_us - self._connect_at
+        if elapsed < self._join_us:
+            return STAT_CONNECTING
+        if self._failure is not None:
+            return self._failure
+        if self._generation != self._network.generation:
+            return STAT_CONNECT_FAIL  # Dropped by an outage
+        if not self._static and elapsed < self._join_us + self._network.dhcp_ms * 1000:
+            return STAT_NOIP
+        return STAT_GOT_IP
+
+    def isconnected(self):
+        return self.status() == STAT_GOT_IP
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._static or self._network.lease
+        self._static = tuple(config)
+
+    def scan(self):
+        network = self._network
+        network.scans += 1
+        network.sim.clock.advance(network.scan_ms * 1000)
+        if not network.up:
+            return []
+        return [(ap.ssid.encode(), ap.bssid, ap.channel, ap.rssi, 3, 0) for ap in network.access_points]
@@ -0,0 +1,13 @@
+from sim import simulation
+
+host = 'pool.ntp.org'
+timeout = 1
+
+
+def settime():
+    sim = simulation.active
+    if not sim.network.station_connected():
+        sim.clock.advance(timeout * 1000000)
+        raise OSError(110, 'ETIMEDOUT')
+    sim.clock.advance(30000)
+    sim.clock.set_time(sim.epoch())
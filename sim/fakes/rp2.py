@@ -0,0 +1,89 @@
+"""
+rp2 for the Pico W, with a state machine that takes time to run the words put to it.
+"""
+
+from sim import simulation
+
+
+def country(code=None):
+    pass
+
+
+def bootsel_button():
+    return 0
+
+
+class PIO:
+    IN_LOW = 0
+    IN_HIGH = 1
+    OUT_LOW = 2
+    OUT_HIGH = 3
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+    JOIN_NONE = 0
+    JOIN_TX = 1
+    JOIN_RX = 2
+
+
+def asm_pio(**kwargs):
+    # Programs are never assembled, so their bodies aren't ran
+    return lambda program: program
+
+
+class StateMachine:
+    """
+    A state machine which takes cycles_per_word at its frequency to run each word put to it, without running
+    the program itself. Programs are assumed to pull a word at a time, with the TX FIFO joined.
+    Each word is kept in words, along with the time (in simulation us) it was pulled from the FIFO in started_us.
+    """
+
+    cycles_per_word = 60  # About what the HD44780 program takes, it being the only one used here
+    fifo_depth = 8
+
+    def __init__(self, id, program=None, freq=125000000, **kwargs):
+        self.id = id
+        self.freq = freq
+        self.words = []
+        self.started_us = []
+        self._finishes_us = []  # When each word yet to finish will do so
+
+    def init(self, program=None, freq=None, **kwargs):
+        self.freq = freq or self.freq
+
+    def active(self, value=None):
+        return 1
+
+    def put(self, value, shift=0):
+        # As on the Pico, a single word or any buffer of words, such as an array or a memoryview of one
+        if isinstance(value, int):
+            value = [value]
+        elif not isinstance(value, (list, tuple)):
+            value = memoryview(value)
+        clock = simulation.active.clock
+        for word in value:
+            # Blocks while the FIFO is full, with the word being shifted out no longer in it
+            self._pending(clock)
+            while len(self._finishes_us) > self.fifo_depth:
+                clock.advance_to(self._finishes_us[0])
+                self._pending(clock)
+            started = max([clock.now_us] + self._finishes_us[-1:])
+            self._finishes_us.append(started + self.cycles_per_word * 1000000 // self.freq)
+            self.words.append(word << shift)
+            self.started_us.append(started)
+
+    def exec(self, instruction):
+        pass
+
+    def tx_fifo(self):
+        # Checking takes a little time, so polling this in a loop lets the words be sent
+        clock = simulation.active.clock
+        clock.advance(1)
+        return max(len(self._pending(clock)) - 1, 0)
+
+    def rx_fifo(self):
+        return 0
+
+    def _pending(self, clock):
+        while self._finishes_us and self._finishes_us[0] <= clock.now_us:
+            self._finishes_us.pop(0)
+        return self._finishes_us
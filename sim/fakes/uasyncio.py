@@ -0,0 +1,89 @@
+"""
+uasyncio on top of CPython's asyncio, with an event loop that runs on the simulation's virtual clock.
+Rather than waiting for I/O, the loop jumps the clock forward to its next timer, or to the next scheduled
+simulation event (such as an input pin changing) if that's sooner.
+"""
+
+import asyncio
+import math
+import selectors
+from asyncio import *  # noqa: F401,F403
+from sim import simulation
+from sim.clock import SimulationEnd
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+
+    def select(self, timeout=None):
+        clock = simulation.active.clock
+        next_event = clock.next_event_us()
+        if timeout is None:
+            # Nothing left to run until an event, or ever
+            if next_event is None:
+                clock.advance_to(clock.end_us + 1 if clock.end_us is not None else clock.now_us)
+                raise SimulationEnd()
+            clock.advance_to(next_event)
+        elif timeout > 0:
+            until = clock.now_us + math.ceil(timeout * 1000000)
+            clock.advance_to(until if next_event is None else min(until, next_event))
+        return []
+
+
+class _VirtualLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self):
+        super().__init__(_VirtualSelector())
+
+    def time(self):
+        return simulation.active.clock.now_us / 1000000
+
+    def create_task(self, coro, **kwargs):
+        task = super().create_task(coro, **kwargs)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        # Checked once any task awaiting this one has been woken, as only errors nobody awaits are unhandled
+        self.call_soon(self._check_unhandled, task)
+
+    def _check_unhandled(self, task):
+        # As uasyncio does, the exception handler hears of an unhandled error as soon as the task fails,
+        # rather than once the task is garbage collected as CPython's asyncio does
+        if not task.cancelled() and task._log_traceback:
+            self.call_exception_handler({
+                'message': 'Task exception wasn\'t retrieved',
+                'exception': task.exception(),
+                'future': task,
+            })
+
+
+class ThreadSafeFlag(asyncio.Event):
+
+    async def wait(self):
+        await super().wait()
+        self.clear()
+
+
+def sleep_ms(ms):
+    return asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(awaitable, timeout_ms):
+    return await asyncio.wait_for(awaitable, timeout_ms / 1000)
+
+
+def new_event_loop():
+    # As on the Pico, the tasks of any previous loop are dropped
+    simulation.active.discard_loops()
+    loop = _VirtualLoop()
+    asyncio.set_event_loop(loop)
+    simulation.active.loops.append(loop)
+    return loop
+
+
+def get_event_loop():
+    return asyncio.get_event_loop()
+
+
+def run(coro):
+    return new_event_loop().run_until_complete(coro)
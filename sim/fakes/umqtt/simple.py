@@ -0,0 +1,68 @@
+"""
+umqtt.simple's MQTTClient, connecting to the simulation's broker.
+Calls fail with an OSError, as a socket would on the Pico, if the broker or WiFi goes down while connected.
+"""
+
+from sim import simulation
+
+
+class MQTTException(Exception):
+    pass
+
+
+class MQTTClient:
+
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0, ssl=None, ssl_params=None):
+        self.client_id = client_id
+        self.server = server
+        self.user = user
+        self.password = password
+        self.keepalive = keepalive
+        self._connection = None
+
+    def _broker(self):
+        return simulation.active.broker
+
+    def _generations(self):
+        broker = self._broker()
+        return broker.generation, broker.sim.network.generation
+
+    def _check_connected(self):
+        broker = self._broker()
+        if self._connection is None or self._connection != self._generations() or not broker.reachable():
+            self._connection = None
+            raise OSError(104, 'ECONNRESET')
+
+    def connect(self, clean_session=True):
+        broker = self._broker()
+        if not broker.reachable():
+            raise OSError(113, 'EHOSTUNREACH')
+        broker.sim.clock.advance(broker.connect_ms * 1000)
+        if broker.refuse:
+            # CONNACK return code 5, not authorized
+            raise MQTTException(5)
+        self._connection = self._generations()
+        broker.connects += 1
+        return 0
+
+    def disconnect(self):
+        self._check_connected()
+        self._connection = None
+
+    def ping(self):
+        self._check_connected()
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self._check_connected()
+        topic = topic.decode() if isinstance(topic, (bytes, bytearray)) else topic
+        msg = msg.encode() if isinstance(msg, str) else bytes(msg)
+        self._broker().receive(topic, msg, retain)
+
+    def set_callback(self, callback):
+        self._callback = callback
+
+    def subscribe(self, topic, qos=0):
+        self._check_connected()
+
+    def check_msg(self):
+        self._check_connected()
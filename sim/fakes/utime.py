@@ -0,0 +1,60 @@
+"""
+Stands in for both time & utime, using the simulation's virtual clock.
+Anything else, like CPython's time.monotonic(), falls back to the real time module for libraries loaded mid-run.
+"""
+
+import time as _time
+from sim import simulation
+from sim.clock import TICKS_MASK, TICKS_PERIOD
+
+
+def _clock():
+    return simulation.active.clock
+
+
+def ticks_ms():
+    return _clock().ticks_ms()
+
+
+def ticks_us():
+    return _clock().ticks_us()
+
+
+def ticks_cpu():
+    return _clock().ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MASK
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) & TICKS_MASK
+    return diff - TICKS_PERIOD if diff >= TICKS_PERIOD // 2 else diff
+
+
+def sleep(seconds):
+    _clock().advance(seconds * 1000000)
+
+
+def sleep_ms(ms):
+    _clock().advance(ms * 1000)
+
+
+def sleep_us(us):
+    _clock().advance(us)
+
+
+def time():
+    return _clock().time()
+
+
+def gmtime(secs=None):
+    return tuple(_time.gmtime(time() if secs is None else secs))[:8]
+
+
+localtime = gmtime
+
+
+def __getattr__(name):
+    return getattr(_time, name)
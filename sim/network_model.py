@@ -0,0 +1,127 @@
+"""
+Models of the WiFi network & MQTT broker the Picos connect to.
+Both can be taken down (via their up attribute, such as from a scheduled callback) to simulate an outage.
+Connections made before an outage are dropped by it, so need to be made again.
+"""
+
+# Statuses as given by network.WLAN.status() on the Pico W
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_NOIP = 2
+STAT_GOT_IP = 3
+STAT_CONNECT_FAIL = -1
+STAT_NO_AP_FOUND = -2
+STAT_WRONG_PASSWORD = -3
+
+
+class AccessPoint:
+
+    def __init__(self, ssid, password, bssid=b'\x11\x22\x33\x44\x55\x66', channel=6, rssi=-55):
+        self.ssid = ssid
+        self.password = password
+        self.bssid = bssid
+        self.channel = channel
+        self.rssi = rssi
+
+
+class Network:
+    """
+    The WiFi network, with the times taken to join & get a DHCP lease.
+    Joining a given BSSID skips the scan for the access point, so is quicker.
+    """
+
+    def __init__(self, sim, access_points):
+        self.sim = sim
+        self.access_points = access_points
+        self.scan_ms = 2000
+        self.join_ms = 1800
+        self.join_bssid_ms = 500
+        self.dhcp_ms = 1200
+        self.lease = ('192.168.1.50', '255.255.255.0', '192.168.1.1', '192.168.1.1')
+        self.joins = 0
+        self.scans = 0
+        self._up = True
+        self.generation = 0
+        self.station = None
+
+    @property
+    def up(self):
+        return self._up
+
+    @up.setter
+    def up(self, up):
+        if self._up and not up:
+            self.generation += 1
+        self._up = up
+
+    def find(self, ssid, bssid=None):
+        for access_point in self.access_points:
+            if access_point.ssid == ssid and (bssid is None or access_point.bssid == bssid):
+                return access_point
+        return None
+
+    def station_connected(self):
+        return self.station is not None and self.station.status() == STAT_GOT_IP
+
+
+class Message:
+
+    def __init__(self, topic, payload, retain, at_ms):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain
+        self.at_ms = at_ms
+
+    def __repr__(self):
+        return '<Message {} {!r}{} at {}ms>'.format(self.topic, self.payload, ' (retained)' if self.retain else '', self.at_ms)
+
+
+class Broker:
+    """
+    An in-process stand-in for the MQTT broker, keeping every message published, along with retained messages.
+    Connecting blocks for connect_ms, as the TCP & MQTT handshakes do on the Pico.
+    While refuse is set, connections are rejected by the broker, as they would be for bad credentials.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.connect_ms = 60
+        self.messages = []
+        self.retained = {}
+        self.connects = 0
+        self.refuse = False
+        self._up = True
+        self.generation = 0
+
+    @property
+    def up(self):
+        return self._up
+
+    @up.setter
+    def up(self, up):
+        if self._up and not up:
+            self.generation += 1
+        self._up = up
+
+    def reachable(self):
+        return self._up and self.sim.network.station_connected()
+
+    def receive(self, topic, payload, retain):
+        message = Message(topic, payload, retain, self.sim.clock.now_us // 1000)
+        self.messages.append(message)
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+
+    def payloads(self, topic):
+        """ Get the payloads published to the given topic, in order """
+        return [message.payload for message in self.messages if message.topic == topic]
+
+    def topics(self):
+        """ Get the number of messages published to each topic """
+        counts = {}
+        for message in self.messages:
+            counts[message.topic] = counts.get(message.topic, 0) + 1
+        return counts
@@ -0,0 +1,220 @@
+import importlib
+import os
+import runpy
+import sys
+import tempfile
+import time
+import types
+
+from sim.clock import Clock, SimulationEnd
+from sim.devices import PinState
+from sim.network_model import AccessPoint, Broker, Network
+
+# The simulation currently running, used by the fake modules
+active = None
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+default_config = {
+    'mqtt_server': 'sim-broker',
+    'mqtt_user': 'sim',
+    'mqtt_pass': 'sim',
+    'mqtt_client_id': 'sim',
+    'wifi_ssid': 'sim-network',
+    'wifi_pass': 'sim-password',
+}
+
+# Module names, and the fake each is replaced with while running
+fake_modules = {
+    'time': 'utime',
+    'utime': 'utime',
+    'uasyncio': 'uasyncio',
+    'machine': 'machine',
+    'network': 'network',
+    'rp2': 'rp2',
+    'ntptime': 'ntptime',
+    'micropython': 'micropython',
+    'umqtt': 'umqtt',
+    'umqtt.simple': 'umqtt.simple',
+}
+
+
+class Simulation:
+    """
+    Runs a device script, unmodified, against models of the Pico's hardware, network & MQTT broker,
+    in virtual time. Files the firmware writes go to flash_dir, which is kept between boots.
+
+    Models are attached before running, such as via sim.boards, and inputs scripted via at() to change
+    pins or take down the network at given times. Calling run() again boots the device again, as a power cycle
+    would, with its flash & the broker's retained messages kept. If the firmware calls machine.reset() while
+    running, it's booted again, unless reboot is False.
+    """
+
+    def __init__(self, script, config=None, flash_dir=None, start_time=1767225600, ticks_start_ms=0):
+        self.script = os.path.abspath(script)
+        self.config = dict(default_config, **(config or {}))
+        self.start_time = start_time
+        self.flash_dir = flash_dir or tempfile.mkdtemp(prefix='sim_flash_')
+        self.unique_id = b'\xe6\x61\x41\x04\x03\x2b\x5f\x2c'
+        self.clock = Clock(ticks_start_ms)
+        self.pins = {}
+        self.i2c_devices = {}
+        self.devices = []
+        self.network = Network(self, [AccessPoint(self.config['wifi_ssid'], self.config['wifi_pass'])])
+        self.broker = Broker(self)
+        self.boots = 0
+        self.resets = 0
+        self.output = []
+        self.loops = []
+        self.host_seconds = 0.0
+        self.verbose = False
+        self._line = ''
+
+    def seconds(self):
+        """ Get the simulated time, in seconds since the simulation started """
+        return self.clock.now_us / 1000000
+
+    def epoch(self):
+        """ Get the real world time, in seconds since the epoch, as NTP would give """
+        return self.start_time + self.clock.now_us // 1000000
+
+    def pin(self, id):
+        if id not in self.pins:
+            self.pins[id] = PinState(id)
+        return self.pins[id]
+
+    def add_device(self, device):
+        self.devices.append(device)
+        return device
+
+    def add_i2c_device(self, bus, device, address=None):
+        self.i2c_devices[(bus, address or device.address)] = device
+        return self.add_device(device)
+
+    def at(self, ms, callback):
+        """ Run the given callback at the given time, in ms since the simulation started """
+        self.clock.at(int(ms * 1000), callback)
+
+    def set_pin(self, ms, id, value):
+        self.at(ms, lambda: self.pin(id).set(value))
+
+    def press(self, ms, id, hold_ms=200):
+        """ Press & release a button wired to pull the given pin high """
+        self.set_pin(ms, id, 1)
+        self.set_pin(ms + hold_ms, id, 0)
+
+    def outage(self, ms, duration_ms, network=True, broker=False):
+        """ Take down the WiFi network and/or the MQTT broker for a while """
+        for model, down in ((self.network, network), (self.broker, broker)):
+            if down:
+                self.at(ms, lambda model=model: setattr(model, 'up', False))
+                self.at(ms + duration_ms, lambda model=model: setattr(model, 'up', True))
+
+    def run(self, ms, reboot=True, verbose=False):
+        """ Run the firmware for the given number of simulated ms """
+        global active
+        from sim.fakes.machine import MachineReset
+
+        self.verbose = verbose
+        self.clock.end_us = self.clock.now_us + int(ms * 1000)
+        started = time.perf_counter()
+        saved_modules, saved_cwd, saved_stdout = self._install()
+        active = self
+        try:
+            while True:
+                try:
+                    self._boot()
+                except SimulationEnd:
+                    break
+                except MachineReset:
+                    self.resets += 1
+                    self._print('** machine.reset() **\n')
+                    if not reboot:
+                        break
+                else:
+                    # The script finished, so the Pico would be sitting idle at the REPL
+                    self.clock.advance_to(self.clock.end_us)
+                    break
+        finally:
+            self.discard_loops()
+            active = None
+            self._uninstall(saved_modules, saved_cwd, saved_stdout)
+            self.host_seconds += time.perf_counter() - started
+        return self
+
+    def _boot(self):
+        self.boots += 1
+        self.clock.boot()
+        self.discard_loops()
+        for state in self.pins.values():
+            state.irq = None
+        for device in self.devices:
+            if hasattr(device, 'boot'):
+                device.boot()
+        # Modules are loaded fresh on each boot, as they would be on the Pico
+        for name in list(sys.modules):
+            if name == 'config' or name == 'libraries' or name.startswith('libraries.'):
+                del sys.modules[name]
+        sys.modules['config'] = self._config_module()
+        runpy.run_path(self.script, run_name='__main__')
+
+    def _config_module(self):
+        config = types.ModuleType('config')
+        config.__dict__.update(self.config)
+        return config
+
+    def discard_loops(self):
+        """ Discard the event loops not running, and their pending tasks, without the firmware's error handler hearing of it """
+        for loop in self.loops:
+            if not loop.is_running():
+                loop.set_exception_handler(lambda loop, context: None)
+                loop.close()
+        self.loops = [loop for loop in self.loops if not loop.is_closed()]
+
+    def _install(self):
+        saved_modules = {name: sys.modules.get(name) for name in list(fake_modules) + ['config']}
+        # Fakes are all imported before any are installed, so CPython's asyncio gets the real time module
+        fakes = {name: importlib.import_module('sim.fakes.' + fake) for name, fake in fake_modules.items()}
+        sys.modules.update(fakes)
+        if repo_root not in sys.path:
+            sys.path.insert(0, repo_root)
+        saved_cwd = os.getcwd()
+        os.chdir(self.flash_dir)
+        saved_stdout = sys.stdout
+        sys.stdout = _Output(self)
+        return saved_modules, saved_cwd, saved_stdout
+
+    def _uninstall(self, saved_modules, saved_cwd, saved_stdout):
+        sys.stdout = saved_stdout
+        os.chdir(saved_cwd)
+        for name, module in saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        for name in list(sys.modules):
+            if name == 'libraries' or name.startswith('libraries.'):
+                del sys.modules[name]
+
+    def _print(self, text):
+        # Output is kept as (ms since start, line), and shown with the time if verbose
+        self._line += text
+        while '\n' in self._line:
+            line, self._line = self._line.split('\n', 1)
+            at_ms = self.clock.now_us // 1000
+            self.output.append((at_ms, line))
+            if self.verbose:
+                sys.__stdout__.write('[{:>10.3f}s] {}\n'.format(at_ms / 1000, line))
+
+
+class _Output:
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def write(self, text):
+        self.sim._print(text)
+        return len(text)
+
+    def flush(self):
+        pass
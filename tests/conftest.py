@@ -0,0 +1,31 @@
+"""
+Host-side tests, run with `python3 -m pytest` from the repo root.
+The MicroPython code is run against the fakes in sim/, so no board is needed.
+"""
+
+import os
+import sys
+import textwrap
+
+import pytest
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from sim import Simulation  # noqa: E402
+
+
+@pytest.fixture
+def script(tmp_path):
+    """ Get a Simulation running the given source as its main.py, for trying out drivers against the models """
+    def make(source):
+        # Each in a folder of its own, so a test can compare several
+        folder = tmp_path / 'sim{}'.format(len(list(tmp_path.iterdir())))
+        folder.mkdir()
+        path = folder / 'main.py'
+        path.write_text(textwrap.dedent(source))
+        flash = folder / 'flash'
+        flash.mkdir()
+        return Simulation(str(path), flash_dir=str(flash))
+    return make
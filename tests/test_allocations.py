@@ -0,0 +1,157 @@
+"""
+Checks the sensor drivers' poll paths don't allocate, by polling repeatedly against the simulation's sensor models.
+
+CPython boxes ints, and reuses freed tuples, so allocations can't be counted as they would be on the Pico.
+Instead, while polling:
+  - Each buffer sent or read over I2C is checked to be the driver's preallocated buffer, or a view onto it.
+  - The bytecode run from libraries/ is traced for instructions which build a tuple, list, dict, set, slice,
+    string or function, which would each allocate on the Pico too.
+  - tracemalloc checks that no memory allocated from libraries/ is retained from one poll to the next.
+Floats & large ints aren't counted, as CPython allocates these where the Pico needn't, and the readings the
+drivers return are floats either way.
+"""
+
+import re
+
+from sim.devices import AHT20 as AHT20Model, SCD41 as SCD41Model
+
+TRACE = """
+    import dis
+    import gc
+    import sys
+    import tracemalloc
+    import machine
+    import uasyncio as asyncio
+
+    ALLOCATING = {dis.opmap[name] for name in (
+        'BUILD_TUPLE', 'BUILD_LIST', 'BUILD_MAP', 'BUILD_CONST_KEY_MAP', 'BUILD_SET', 'BUILD_SLICE',
+        'BINARY_SLICE', 'STORE_SLICE', 'BUILD_STRING', 'FORMAT_VALUE', 'LIST_APPEND', 'MAKE_FUNCTION',
+    ) if name in dis.opmap}
+    allocations = []
+    transfers = []
+
+    def trace(frame, event, arg):
+        if '/libraries/' not in frame.f_code.co_filename:
+            return None
+        frame.f_trace_opcodes = True
+        return trace_opcodes
+
+    def trace_opcodes(frame, event, arg):
+        if event == 'opcode' and frame.f_code.co_code[frame.f_lasti] in ALLOCATING:
+            allocations.append('{}:{} {}'.format(
+                frame.f_code.co_filename.split('/libraries/')[1], frame.f_lineno,
+                dis.opname[frame.f_code.co_code[frame.f_lasti]]))
+        return trace_opcodes
+
+    def record_transfers(i2c):
+        writeto = i2c.writeto
+        readfrom_into = i2c.readfrom_into
+
+        def record_writeto(address, buf, stop=True):
+            transfers.append(buf)
+            return writeto(address, buf, stop)
+
+        def record_readfrom_into(address, buf, stop=True):
+            transfers.append(buf)
+            return readfrom_into(address, buf, stop)
+        i2c.writeto = record_writeto
+        i2c.readfrom_into = record_readfrom_into
+        return i2c
+
+    def retained_blocks(before, after):
+        filters = [tracemalloc.Filter(True, '*/libraries/*')]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        return sum(max(stat.count_diff, 0) for stat in diff)
+
+    async def traced(sensor, poll, count):
+        # Traced from the warm up too, so readings kept from one poll to the next are seen in both snapshots
+        tracemalloc.start()
+        for _ in range(10):
+            await poll()
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        for _ in range(count):
+            await poll()
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        print('retained blocks:', retained_blocks(before, after))
+
+        # Tracing is kept to a run of its own, as it keeps frame objects which tracemalloc would see
+        transfers.clear()
+        sys.settrace(trace)
+        try:
+            for _ in range(count):
+                await poll()
+        finally:
+            sys.settrace(None)
+        print('allocations:', sorted(set(allocations)))
+        print('transfers: {} ({} not via the driver buffer)'.format(len(transfers), len([
+            buf for buf in transfers
+            if buf is not sensor._buf and not (isinstance(buf, memoryview) and buf.obj is sensor._buf)])))
+"""
+
+
+def result(sim, name):
+    for _, line in sim.output:
+        match = re.match(name + r': (.*)', line)
+        if match:
+            return match.group(1)
+    raise AssertionError('No {} in output:\n'.format(name) + '\n'.join(line for _, line in sim.output))
+
+
+def assert_no_allocations(sim):
+    assert result(sim, 'allocations') == '[]'
+    transfers = re.match(r'(\d+) \((\d+) not via the driver buffer\)', result(sim, 'transfers'))
+    assert int(transfers.group(1)) > 0
+    assert int(transfers.group(2)) == 0
+    assert result(sim, 'retained blocks') == '0'
+
+
+def test_aht20_poll_does_not_allocate(script):
+    sim = script(TRACE + """
+    from libraries.ahtx0 import AHT20
+
+    sensor = AHT20(record_transfers(machine.I2C(0, sda=machine.Pin(8), scl=machine.Pin(9))))
+
+    async def poll():
+        # As picow_a polls it, with a new measurement each time
+        await sensor.update_async(0)
+        sensor.temperature
+        sensor.relative_humidity
+
+    asyncio.run(traced(sensor, poll, 200))
+    """)
+    model = sim.add_i2c_device(0, AHT20Model(sim))
+    sim.run(60000)
+
+    assert model.measurements >= 410
+    assert_no_allocations(sim)
+
+
+def test_scd41_poll_does_not_allocate(script):
+    sim = script(TRACE + """
+    from libraries.scd41 import SCD41
+
+    sensor = SCD41(record_transfers(machine.I2C(1, sda=machine.Pin(10), scl=machine.Pin(11))), mode=SCD41.MODE_PERIODIC)
+
+    async def poll():
+        # Wait for the next reading from the background measurement cycle, then read it as picow_b does
+        await asyncio.sleep_ms(5000)
+        await sensor.wait_for_reading()
+        sensor.temperature
+        sensor.relative_humidity
+        sensor.carbon_dioxide
+
+    async def main():
+        asyncio.create_task(sensor.run())
+        await traced(sensor, poll, 100)
+        sensor.stop()
+
+    asyncio.run(main())
+    """)
+    model = sim.add_i2c_device(1, SCD41Model(sim))
+    sim.run(1200000)
+
+    assert model.measurements >= 200
+    assert_no_allocations(sim)
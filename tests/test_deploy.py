@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+import build  # noqa: E402
+import deploy  # noqa: E402
+from fake_board import FakeBoardSerial  # noqa: E402
+
+files = {
+    'main.py': b'import app\n',
+    'app.mpy': b'M\x06app' + bytes(300),
+    'libraries/node/node.mpy': b'M\x06node' + bytes(5000),
+}
+
+
+@pytest.fixture
+def out(tmp_path):
+    """ A build output folder, standing in for tools/build.py, returning (out_dir, manifest) for its files """
+    out_dir = tmp_path / 'build'
+
+    def make(**changes):
+        for path, data in dict(files, **changes).items():
+            if data is None:
+                os.remove(out_dir / path)
+                continue
+            (out_dir / path).parent.mkdir(parents=True, exist_ok=True)
+            (out_dir / path).write_bytes(data)
+        manifest = {}
+        for dirpath, _, filenames in os.walk(out_dir):
+            for filename in filenames:
+                path = os.path.relpath(os.path.join(dirpath, filename), out_dir).replace(os.sep, '/')
+                manifest[path] = build.file_hash(os.path.join(dirpath, filename))
+        return str(out_dir), manifest
+    return make
+
+
+@pytest.fixture
+def board_dir(tmp_path):
+    return tmp_path / 'board'
+
+
+def run(out_dir, manifest, board_dir, capsys):
+    deploy.deploy('test', out_dir, manifest, 'fake:' + str(board_dir))
+    return capsys.readouterr().out.strip()
+
+
+def board_files(board_dir):
+    found = {}
+    for dirpath, _, filenames in os.walk(board_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as file:
+                found[os.path.relpath(path, board_dir).replace(os.sep, '/')] = file.read()
+    return found
+
+
+def test_full_deploy_then_no_op(out, board_dir, capsys):
+    out_dir, manifest = out()
+
+    assert run(out_dir, manifest, board_dir, capsys).startswith('test: 3 of 3 files changed, 0 removed, 5322 bytes sent')
+    on_board = board_files(board_dir)
+    assert json.loads(on_board.pop('manifest.json')) == manifest
+    assert on_board == files
+
+    assert run(out_dir, manifest, board_dir, capsys).startswith('test: 0 of 3 files changed, 0 removed, 0 bytes sent')
+
+
+def test_only_changed_files_are_sent(out, board_dir, capsys):
+    run(*out(), board_dir, capsys)
+    out_dir, manifest = out(**{'app.mpy': b'M\x06app changed'})
+
+    assert run(out_dir, manifest, board_dir, capsys).startswith('test: 1 of 3 files changed, 0 removed, 13 bytes sent')
+    assert board_files(board_dir)['app.mpy'] == b'M\x06app changed'
+
+
+def test_files_no_longer_built_are_removed(out, board_dir, capsys):
+    run(*out(extra=b'old'), board_dir, capsys)
+    out_dir, manifest = out(extra=None)
+
+    assert run(out_dir, manifest, board_dir, capsys).startswith('test: 0 of 3 files changed, 1 removed')
+    assert 'extra' not in board_files(board_dir)
+
+
+def test_sources_shadowing_unchanged_modules_are_removed(out, board_dir, capsys):
+    out_dir, manifest = out()
+    run(out_dir, manifest, board_dir, capsys)
+    # Copied over by hand, such as via Thonny, after the last deploy
+    (board_dir / 'libraries/node/node.py').write_bytes(b'print("old")')
+    (board_dir / 'data.json').write_bytes(b'{}')
+
+    run(out_dir, manifest, board_dir, capsys)
+    on_board = board_files(board_dir)
+    assert 'libraries/node/node.py' not in on_board
+    # Files the firmware keeps, which aren't part of the build, are left alone
+    assert on_board['data.json'] == b'{}'
+
+
+class UnpluggedSerial(FakeBoardSerial):
+    """ A board that's unplugged after the given number of bytes have been sent to it """
+
+    def __init__(self, folder, after_bytes):
+        super().__init__(folder)
+        self.after_bytes = after_bytes
+
+    def write(self, data):
+        self.after_bytes -= len(data)
+        if self.after_bytes < 0:
+            raise OSError(5, 'Input/output error')
+        return super().write(data)
+
+
+def test_interrupted_deploy_leaves_files_to_send_again(out, board_dir, capsys, monkeypatch):
+    out_dir, manifest = out()
+    monkeypatch.setattr(deploy, 'open_port', lambda port: UnpluggedSerial(port[5:], 4000))
+
+    with pytest.raises(OSError):
+        deploy.deploy('test', out_dir, manifest, 'fake:' + str(board_dir))
+    on_board = board_files(board_dir)
+    assert 'manifest.json' not in on_board
+    # Nothing is left partly written, only the temporary file it was being written to
+    assert on_board.get('libraries/node/node.mpy') in (None, files['libraries/node/node.mpy'])
+
+    monkeypatch.undo()
+    assert run(out_dir, manifest, board_dir, capsys).startswith('test: 3 of 3 files changed')
+    on_board = board_files(board_dir)
+    assert json.loads(on_board.pop('manifest.json')) == manifest
+    assert {path: data for path, data in on_board.items() if not path.endswith('.tmp')} == files
+
+
+def test_deploys_to_several_boards_at_once(out, tmp_path, capsys, monkeypatch):
+    out_dir, manifest = out()
+    monkeypatch.setattr(build, 'build', lambda device: (out_dir, manifest))
+    boards = [tmp_path / 'board_a', tmp_path / 'board_b']
+
+    assert deploy.main(['picow_a=fake:' + str(boards[0]), 'picow_b=fake:' + str(boards[1])])
+    for board in boards:
+        on_board = board_files(board)
+        assert json.loads(on_board.pop('manifest.json')) == manifest
+        assert on_board == files
+
+    # A failing board doesn't stop the others
+    (boards[0] / 'app.mpy').unlink()
+    (boards[0] / 'manifest.json').unlink()
+    assert not deploy.main(['picow_a=fake:' + str(boards[0]), 'picow_b=' + str(tmp_path / 'no-such-port')])
+    assert board_files(boards[0])['app.mpy'] == files['app.mpy']
@@ -0,0 +1,65 @@
+from sim.devices import HD44780 as DisplayModel
+
+# Each step is a message to write, or the slot & rows of a glyph to define, with 100ms between each
+LCD_SCRIPT = """
+    STEPS = {!r}
+    import machine
+    import utime
+    from libraries.hd44780 import HD44780
+
+    pins = [machine.Pin(id, machine.Pin.OUT) for id in (28, 27, 26, 22, 21, 20)]
+    display = HD44780(*pins)
+    for step in STEPS:
+        if isinstance(step, str):
+            display.write(step)
+        else:
+            display.define_glyph(*step)
+        utime.sleep_ms(100)
+"""
+
+UP_ARROW = [0x04, 0x0E, 0x15, 0x04, 0x04, 0x04, 0x04, 0x00]
+
+
+def show(script, *steps):
+    """ Run the given steps, returning the display model & the (bytes, clears) it had received after each """
+    sim = script(LCD_SCRIPT.format(list(steps)))
+    display = sim.add_device(DisplayModel(sim, rs=28, enable=27, data4=26, data5=22, data6=21, data7=20))
+    counts = []
+    for step in range(len(steps)):
+        sim.at(50 + step * 100, lambda: counts.append((display.bytes, display.clears)))
+    sim.run(1000)
+    return display, counts
+
+
+def test_write_shows_lines(script):
+    display, _ = show(script, 'T 21.5, RH 45.0\nCO2 800ppm')
+    assert display.lines == ['T 21.5, RH 45.0 ', 'CO2 800ppm      ']
+    assert display.timing_violations == 0
+
+
+def test_write_shows_characters_beyond_8_bits_as_question_marks(script):
+    display, _ = show(script, 'Temp 21°C ↑\nCO2 ✓')
+    assert display.lines == ['Temp 21°C ?     ', 'CO2 ?           ']
+
+
+def test_write_only_sends_changed_characters(script):
+    display, counts = show(script, 'T 21.5, RH 45.0\nCO2 800ppm', 'T 21.5, RH 45.0\nCO2 810ppm')
+    assert display.lines[1] == 'CO2 810ppm      '
+
+    # Moving the cursor to the changed digit, then the digit itself, without clearing
+    (first_bytes, first_clears), (second_bytes, second_clears) = counts
+    assert second_bytes - first_bytes == 2
+    assert second_clears == first_clears
+
+
+def test_define_glyph_only_sends_changed_glyphs(script):
+    changed = UP_ARROW[:7] + [0x1F]
+    display, counts = show(script, (0, UP_ARROW), (0, UP_ARROW), (0, changed), 'CO2 \x00')
+    (defined, _), (redefined, _), (changed_bytes, _), _ = counts
+
+    assert redefined == defined
+    # Setting the CGRAM address, then the 8 rows
+    assert changed_bytes - redefined == 9
+    assert display.cgram[0:8] == bytes(changed)
+    # The cursor is left in CGRAM, so the following write has to move it back to the display
+    assert display.lines[0] == 'CO2 \x00           '
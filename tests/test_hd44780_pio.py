@@ -0,0 +1,61 @@
+"""
+Checks the PIO backend sends the display the same bytes as the pin backend, by decoding the words put to the
+simulation's state machine. The state machine's program isn't ran, so only the initialization, which is
+bit-banged by both, reaches the display model.
+"""
+
+import ast
+
+from sim.devices import HD44780 as DisplayModel
+
+LCD_SCRIPT = """
+    import machine
+    from libraries.{module} import {backend}
+
+    pins = [machine.Pin(id, machine.Pin.OUT) for id in (28, 27, 26, 22, 21, 20)]
+    display = {backend}(*pins)
+    display.define_glyph(0, [0x04, 0x0E, 0x15, 0x04, 0x04, 0x04, 0x04, 0x00])
+    display.write('T 21.5, RH 45.0\\nCO2 800ppm \\x00')
+    display.write('T 21.6, RH 45.0\\nCO2 810ppm \\x00', clear=True)
+    display.define_glyph(0, [0x04, 0x04, 0x04, 0x04, 0x15, 0x0E, 0x04, 0x00])
+    display.write('T 21.6, RH 44.0\\nCO2 810ppm \\x00')
+    if hasattr(display, '_sm'):
+        print('words:', display._sm.words)
+        print('started:', display._sm.started_us)
+"""
+
+CLEAR_DELAY_US = 1520
+SEND_DELAY_US = 50  # Waited by _wait_until_sent(), for the last word to be shifted out
+
+
+def run(script, module, backend):
+    sim = script(LCD_SCRIPT.format(module=module, backend=backend))
+    display = sim.add_device(DisplayModel(sim, rs=28, enable=27, data4=26, data5=22, data6=21, data7=20))
+    sim.run(1000)
+    printed = dict(line.split(': ', 1) for _, line in sim.output)
+    return display, {name: ast.literal_eval(value) for name, value in printed.items()}
+
+
+def decode(word):
+    # Each word is the RS flag & byte, shifted up to the top of the 32-bit output register
+    assert word & ((1 << 23) - 1) == 0
+    return word >> 31, word >> 23 & 0xFF
+
+
+def test_pio_sends_the_same_bytes_as_the_pin_backend(script):
+    pins, _ = run(script, 'hd44780', 'HD44780')
+    pio, printed = run(script, 'hd44780_pio', 'HD44780PIO')
+
+    assert pins.timing_violations == 0
+    assert pio.received + [decode(word) for word in printed['words']] == pins.received
+
+
+def test_pio_waits_out_clears_before_sending_more(script):
+    _, printed = run(script, 'hd44780_pio', 'HD44780PIO')
+    sent = [(decode(word), started) for word, started in zip(printed['words'], printed['started'])]
+
+    clears = [index for index, ((rs, byte), _) in enumerate(sent) if not rs and byte < 0x04]
+    assert clears
+    for index in clears:
+        # Counted from when the state machine took the clear, so time spent queued behind earlier words isn't counted
+        assert sent[index + 1][1] - sent[index][1] >= SEND_DELAY_US + CLEAR_DELAY_US
@@ -0,0 +1,69 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from libraries.node import scheduler
+from libraries.node.scheduler import Scheduler, IDLE_SLEEP_MS, REBASE_AFTER_MS
+from sim.clock import Clock, TICKS_PERIOD
+from sim.fakes import utime
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch):
+    # The scheduler only needs the ticks arithmetic, as it's always given the time here
+    monkeypatch.setattr(scheduler, 'time', utime)
+
+
+def sensors(*poll_rates_ms):
+    return [SimpleNamespace(name='sensor %d' % index, poll_rate_ms=rate) for index, rate in enumerate(poll_rates_ms)]
+
+
+def run(sched, clock, until_ms, max_late_ms, seed=0):
+    """ Run a poll loop against the clock, waking up to max_late_ms late. Returns {sensor: [poll times]} """
+    rng = random.Random(seed)
+    polls = {}
+    while clock.now_us < until_ms * 1000:
+        now = clock.ticks_ms()
+        sensor = sched.next_due(now)
+        while sensor:
+            polls.setdefault(sensor.name, []).append(clock.now_us // 1000)
+            sensor = sched.next_due(now)
+        clock.advance((sched.time_to_next_poll(clock.ticks_ms()) + rng.randint(0, max_late_ms)) * 1000)
+    return polls
+
+
+def test_polls_stay_within_lateness_of_schedule_across_ticks_wrap_and_rebase():
+    max_late_ms = 30
+    until_ms = REBASE_AFTER_MS + 3600000
+    # Ticks start just short of wrapping, so the run crosses both a wrap and an epoch rebase
+    clock = Clock(ticks_start_ms=TICKS_PERIOD - 60000)
+    rates = (1000, 2500, 30000, 60000)
+    sched = Scheduler(sensors(*rates), now=clock.ticks_ms())
+
+    polls = run(sched, clock, until_ms, max_late_ms)
+
+    for index, rate in enumerate(rates):
+        times = polls['sensor %d' % index]
+        # Every poll is within the lateness of its slot on the original schedule, so there's no drift
+        assert all(at % rate <= max_late_ms for at in times)
+        # And none are skipped or repeated
+        assert [at // rate for at in times] == list(range(1, len(times) + 1))
+        assert len(times) >= until_ms // rate - 1
+
+
+def test_missed_polls_are_skipped_staying_on_schedule():
+    clock = Clock()
+    sched = Scheduler(sensors(1000), now=clock.ticks_ms())
+
+    # Wake 3.5 periods late, as if blocked by a slow operation
+    clock.advance(4500 * 1000)
+    assert sched.next_due(clock.ticks_ms()) is not None
+    assert sched.next_due(clock.ticks_ms()) is None
+    assert sched.time_to_next_poll(clock.ticks_ms()) == 500
+
+
+def test_no_sensors():
+    sched = Scheduler([], now=0)
+    assert sched.next_due(0) is None
+    assert sched.time_to_next_poll(0) == IDLE_SLEEP_MS
@@ -0,0 +1,62 @@
+"""
+Checks the simulation's stand-ins for MicroPython modules behave as they do on the Pico.
+"""
+
+TASK_ERROR = """
+    HANDLER = {handler}
+    import machine
+    import uasyncio as asyncio
+
+    async def fail():
+        raise ValueError('failed')
+
+    async def main():
+        asyncio.get_event_loop().set_exception_handler(lambda loop, context: HANDLER(context))
+        task = asyncio.create_task(fail())
+        {wait}
+        await asyncio.sleep_ms(1000)
+        print('still running')
+
+    asyncio.run(main())
+"""
+
+
+def printed(sim):
+    return [line for _, line in sim.output]
+
+
+def test_unhandled_task_error_reaches_the_exception_handler_straight_away(script):
+    sim = script(TASK_ERROR.format(handler="lambda context: machine.reset()", wait='pass'))
+    sim.run(5000, reboot=False)
+
+    assert sim.resets == 1
+    assert 'still running' not in printed(sim)
+
+
+def test_awaited_task_error_is_left_to_the_awaiting_task(script):
+    sim = script(TASK_ERROR.format(
+        handler="lambda context: print('handled', context['exception'])",
+        wait="try:\n            await task\n        except ValueError as err:\n            print('caught', err)"))
+    sim.run(5000)
+
+    assert printed(sim) == ['caught failed', 'still running']
+
+
+def test_state_machine_put_takes_buffers_and_blocks_while_the_fifo_is_full(script):
+    sim = script("""
+    import array
+    import rp2
+    import utime
+
+    sm = rp2.StateMachine(0, None, freq=1000000)
+    words = array.array('H', range(20))
+    sm.put(memoryview(words)[0:2], 23)
+    sm.put(2)
+    sm.put(words[3:], 0)
+    print('put in {}us'.format(utime.ticks_us()))
+    print(sm.words[:4])
+    """)
+    sim.run(1000)
+
+    state_machine_us = 60  # The fake's cycles_per_word, at 1MHz
+    assert printed(sim) == ['put in {}us'.format((20 - 9) * state_machine_us), str([0, 1 << 23, 2, 3])]
@@ -0,0 +1,104 @@
+"""
+Smoke tests running the picow_a & picow_b scripts, unmodified, in the simulation.
+"""
+
+import json
+
+from sim import simulate
+
+MINUTE_MS = 60000
+
+
+def printed(sim):
+    return [line for _, line in sim.output]
+
+
+def assert_no_errors(sim):
+    lines = printed(sim)
+    assert not [line for line in lines if 'error' in line.lower() or 'Traceback' in line], '\n'.join(lines)
+    assert sim.resets == 0
+
+
+def test_picow_a_publishes_configs_and_states():
+    sim = simulate('picow_a').run(30 * MINUTE_MS)
+
+    assert_no_errors(sim)
+    for sensor in ('binary_sensor/picow_a_proximity', 'sensor/picow_a_temp', 'sensor/picow_a_rh'):
+        assert 'homeassistant/{}/config'.format(sensor) in sim.broker.retained
+        assert sim.broker.payloads('homeassistant/{}/state'.format(sensor))
+    # The -5°C housing offset is applied to the modelled 26°C ±2
+    temperatures = [float(payload) for payload in sim.broker.payloads('homeassistant/sensor/picow_a_temp/state')]
+    assert all(19 < temperature < 25 for temperature in temperatures)
+    assert json.loads(sim.broker.retained['homeassistant/sensor/picow_a/boot'])
+
+
+def test_picow_b_publishes_states_and_shows_them_on_the_display():
+    sim = simulate('picow_b').run(30 * MINUTE_MS)
+
+    assert_no_errors(sim)
+    co2 = sim.broker.payloads('homeassistant/sensor/picow_b_co2/state')
+    assert co2
+    assert sim.display.timing_violations == 0
+    assert sim.display.lines[0].startswith('T ')
+    assert sim.display.lines[1].startswith('CO2 {}ppm'.format(co2[-1].decode()))
+
+
+def test_picow_b_display_follows_motion():
+    sim = simulate('picow_b')
+    shown = []
+    sim.set_pin(5 * MINUTE_MS, 7, 1)
+    sim.set_pin(5 * MINUTE_MS + 2000, 7, 0)
+    # The motion glyph (character 0) is in the second to last column
+    for ms in range(5 * MINUTE_MS, 5 * MINUTE_MS + 5000, 100):
+        sim.at(ms, lambda ms=ms: shown.append((ms - 5 * MINUTE_MS, sim.display.lines[1][14] == '\x00')))
+    sim.run(6 * MINUTE_MS)
+
+    # Shown & cleared within a display refresh of the pin changing, rather than waiting on the minute poll
+    on = [ms for ms, motion in shown if motion]
+    assert on[0] <= 300
+    assert on[-1] < 2300
+    assert sim.broker.payloads('homeassistant/binary_sensor/picow_b_proximity/state')[-2:] == [b'ON', b'OFF']
+
+
+def test_picow_b_motion_during_boot_is_published_without_upsetting_the_display():
+    # The SCD41's first reading takes about 31.5s in low power mode, so this is before it's read
+    sim = simulate('picow_b')
+    sim.set_pin(5000, 7, 1)
+    sim.set_pin(8000, 7, 0)
+    sim.run(2 * MINUTE_MS)
+
+    assert_no_errors(sim)
+    assert sim.boots == 1
+    assert sim.broker.payloads('homeassistant/binary_sensor/picow_b_proximity/state') == [b'OFF', b'ON', b'OFF']
+    assert sim.display.lines[0].startswith('T ')
+    assert '--' not in sim.display.lines[1]
+
+
+def test_picow_b_logs_readings_while_offline_and_replays_them():
+    sim = simulate('picow_b')
+    sim.outage(10 * MINUTE_MS, 60 * MINUTE_MS)
+    sim.run(80 * MINUTE_MS)
+
+    lines = printed(sim)
+    assert any(line.startswith('Retrying connection in 60000ms') for line in lines)
+    history = sim.broker.payloads('homeassistant/sensor/picow_b/history')
+    assert history
+    readings = [reading for payload in history for readings in json.loads(payload).values() for reading in readings]
+    outage_start = sim.start_time + 10 * 60
+    assert readings and all(outage_start <= timestamp <= outage_start + 60 * 60 for timestamp, _ in readings)
+    # Live states carried on once back online, with the replay not getting in their way
+    assert [message for message in sim.broker.messages
+            if message.topic.endswith('/state') and message.at_ms > 72 * MINUTE_MS]
+
+
+def test_refused_mqtt_connections_are_retried():
+    sim = simulate('picow_a')
+    sim.broker.refuse = True
+    sim.at(2 * MINUTE_MS, lambda: setattr(sim.broker, 'refuse', False))
+    sim.run(5 * MINUTE_MS)
+
+    lines = printed(sim)
+    assert 'Failed to connect: 5' in lines
+    assert sim.resets == 0
+    assert sim.broker.connects == 1
+    assert sim.broker.payloads('homeassistant/sensor/picow_a_temp/state')
@@ -0,0 +1,100 @@
+"""
+Cross-compiles a device's code to .mpy bytecode, ready to be copied to the Pico, so the Pico doesn't have to
+compile the source itself on every boot.
+
+Usage: python3 tools/build.py picow_a [picow_b ...]
+A device can be given as a folder containing a main.py (like picow_a) or as a script (like motion_sensor.py).
+
+The device script is compiled as app.mpy, with a main.py that just imports it, since the Pico will only run
+main.py as source. config.py (if present) and everything in libraries/ are compiled alongside it.
+Output goes to build/<device>/, along with a manifest.json of the sha256 hash of each file.
+tools/deploy.py builds then copies this to the Pico.
+
+Needs mpy-cross, of the same version as the MicroPython firmware on the Pico. Either `pip install mpy-cross`
+or set MPY_CROSS to the path of an mpy-cross binary. Native code is compiled for the RP2040 (armv6m).
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+build_root = os.path.join(root, 'build')
+mpy_cross = os.environ.get('MPY_CROSS', '').split() or [sys.executable, '-m', 'mpy_cross']
+mpy_cross_args = ['-march=armv6m', '-O1']
+
+main_stub = b'import app\n'
+
+
+def sources_for(device):
+    """ Get the (source path, output path) of each file to compile for the given device """
+    script = os.path.join(device, 'main.py') if os.path.isdir(device) else device
+    sources = [(script, 'app.mpy')]
+
+    config = os.path.join(root, 'config.py')
+    if os.path.exists(config):
+        sources.append((config, 'config.mpy'))
+
+    for dirpath, dirnames, filenames in os.walk(os.path.join(root, 'libraries')):
+        dirnames[:] = sorted(name for name in dirnames if name != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                source = os.path.join(dirpath, filename)
+                output = os.path.relpath(source, root)[:-3] + '.mpy'
+                sources.append((source, output.replace(os.sep, '/')))
+    return sources
+
+
+def compile_file(source, output):
+    # Sources are only re-compiled when changed, going by modified time
+    if os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source):
+        return
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    # Embedded source names are kept relative, so tracebacks on the Pico read like the repo
+    name = os.path.relpath(source, root).replace(os.sep, '/')
+    subprocess.run(mpy_cross + mpy_cross_args + ['-s', name, '-o', output, source], check=True)
+
+
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def build(device):
+    name = os.path.splitext(os.path.basename(os.path.normpath(device)))[0]
+    out_dir = os.path.join(build_root, name)
+    manifest = {}
+
+    for source, output in sources_for(device):
+        compile_file(source, os.path.join(out_dir, output))
+        manifest[output] = None
+
+    with open(os.path.join(out_dir, 'main.py'), 'wb') as file:
+        file.write(main_stub)
+    manifest['main.py'] = None
+
+    # Remove output left over from files that no longer exist
+    for dirpath, dirnames, filenames in os.walk(out_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.relpath(path, out_dir).replace(os.sep, '/') not in manifest and filename != 'manifest.json':
+                os.remove(path)
+
+    for path in manifest:
+        manifest[path] = file_hash(os.path.join(out_dir, path))
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+
+    size = sum(os.path.getsize(os.path.join(out_dir, path)) for path in manifest)
+    print('{}: {} files, {} bytes'.format(name, len(manifest), size))
+    return out_dir, manifest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    for device in sys.argv[1:]:
+        build(device)
@@ -0,0 +1,236 @@
+"""
+Builds device code (via tools/build.py) then copies it to one or more Picos over USB serial, only sending
+the files that have changed since the last deploy. Each Pico keeps a manifest.json of the hash of each file
+deployed to it, which is compared against the build to find what needs sending.
+Files are sent via the raw REPL's paste mode, base64 encoded in 4KB chunks, then the Pico is reset.
+
+Usage: python3 tools/deploy.py picow_a=/dev/ttyACM0 [picow_b=/dev/ttyACM1 ...]
+A single device can be given without a port to use /dev/ttyACM0. Multiple devices are deployed to at once.
+A port of fake:<folder> deploys to a stand-in board which keeps its files in that folder on this machine,
+for trying this out without a Pico. See tools/fake_board.py.
+
+Needs pyserial (`pip install pyserial`) for real boards, along with the requirements of tools/build.py.
+Files on the Pico that aren't part of a deploy, such as the WiFi cache or offline log, are left as they are.
+"""
+
+import base64
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import build
+
+default_port = '/dev/ttyACM0'
+chunk_size = 4096
+timeout_s = 10
+
+print_lock = threading.Lock()
+
+
+class Board:
+    """ Runs code on a Pico via its raw REPL, over a serial connection """
+
+    def __init__(self, serial):
+        self.serial = serial
+        self._dirs = set()
+
+    def enter(self):
+        # Interrupt whatever is running, then soft reset within the raw REPL so main.py doesn't start again
+        self.serial.write(b'\r\x03\x03')
+        time.sleep(0.1)
+        self.serial.reset_input_buffer()
+        self.serial.write(b'\r\x01')
+        self.read_until(b'raw REPL; CTRL-B to exit\r\n>')
+        self.serial.write(b'\x04')
+        self.read_until(b'soft reboot\r\n')
+        self.read_until(b'raw REPL; CTRL-B to exit\r\n')
+
+    def exec(self, code):
+        """ Run the given code on the board, returning what it printed. Raises on error. """
+        self.read_until(b'>')
+        self.serial.write(b'\x05A\x01')
+        if self.read(2) != b'R\x01':
+            raise RuntimeError('board does not support raw paste mode')
+        self._paste(code.encode())
+        output = self.read_until(b'\x04')[:-1]
+        error = self.read_until(b'\x04')[:-1]
+        if error:
+            raise RuntimeError(error.decode().strip())
+        return output.decode()
+
+    def reset(self):
+        self.read_until(b'>')
+        self.serial.write(b'\x05A\x01')
+        self.read(2)
+        # The board resets before acknowledging, so this doesn't wait to hear back
+        self._paste(b'import machine\nmachine.reset()', wait=False)
+
+    def read(self, count):
+        data = b''
+        started = time.monotonic()
+        while len(data) < count:
+            data += self.serial.read(count - len(data))
+            if time.monotonic() - started > timeout_s:
+                raise RuntimeError('timed out reading from board')
+        return data
+
+    def read_until(self, ending):
+        data = b''
+        started = time.monotonic()
+        while not data.endswith(ending):
+            data += self.serial.read(1)
+            if time.monotonic() - started > timeout_s:
+                raise RuntimeError('timed out waiting for {} from board'.format(ending))
+        return data
+
+    def _paste(self, data, wait=True):
+        # The board grants a window of bytes which can be sent, then sends 0x01 each time it has room for more
+        window = struct.unpack('<H', self.read(2))[0]
+        remaining = window
+        sent = 0
+        while sent < len(data):
+            while remaining == 0 or self.serial.in_waiting:
+                flag = self.read(1)
+                if flag == b'\x01':
+                    remaining += window
+                elif flag == b'\x04':
+                    # The board stopped reading, most likely due to a syntax error which follows
+                    self.serial.write(b'\x04')
+                    return
+                else:
+                    raise RuntimeError('unexpected {} from board during paste'.format(flag))
+            part = data[sent:sent + remaining]
+            self.serial.write(part)
+            sent += len(part)
+            remaining -= len(part)
+        self.serial.write(b'\x04')
+        if wait:
+            self.read_until(b'\x04')
+
+    def read_manifest(self):
+        output = self.exec(
+            "try:\n"
+            "    print(open('manifest.json').read())\n"
+            "except OSError:\n"
+            "    print('{}')\n"
+        )
+        try:
+            return json.loads(output)
+        except ValueError:
+            return {}
+
+    def make_dirs(self, path):
+        parts = path.split('/')[:-1]
+        dirs = ['/'.join(parts[:i + 1]) for i in range(len(parts))]
+        dirs = [path for path in dirs if path not in self._dirs]
+        if dirs:
+            self.exec(
+                "import os\n"
+                "for path in {}:\n"
+                "    try:\n"
+                "        os.mkdir(path)\n"
+                "    except OSError:\n"
+                "        pass\n".format(dirs)
+            )
+            self._dirs.update(dirs)
+
+    def write_file(self, path, data):
+        # Written to a temporary file first, so an interrupted deploy doesn't leave a partly written file
+        temp = path + '.tmp'
+        self.exec("import binascii, os\nf = open({!r}, 'wb')\nw = f.write\na = binascii.a2b_base64".format(temp))
+        for start in range(0, len(data), chunk_size):
+            self.exec('w(a({!r}))'.format(base64.b64encode(data[start:start + chunk_size]).decode()))
+        self.exec("f.close()\nremove({!r})\nos.rename({!r}, {!r})".format(path, temp, path))
+
+    def remove(self, paths):
+        """ Remove the given files, ignoring any that don't exist """
+        if paths:
+            self.exec("for path in {!r}:\n    remove(path)\n".format(paths))
+
+    def define_remove(self):
+        self.exec(
+            "import os\n"
+            "def remove(path):\n"
+            "    try:\n"
+            "        os.remove(path)\n"
+            "    except OSError:\n"
+            "        pass\n"
+        )
+
+
+def open_port(port):
+    if port.startswith('fake:'):
+        from fake_board import FakeBoardSerial
+        return FakeBoardSerial(port[5:])
+    import serial
+    return serial.Serial(port, 115200, timeout=0.1)
+
+
+def log(name, message):
+    with print_lock:
+        print('{}: {}'.format(name, message))
+
+
+def deploy(name, out_dir, manifest, port):
+    started = time.monotonic()
+    serial = open_port(port)
+    try:
+        board = Board(serial)
+        board.enter()
+        board.define_remove()
+        deployed = board.read_manifest()
+
+        changed = [path for path in sorted(manifest) if deployed.get(path) != manifest[path]]
+        removed = [path for path in sorted(deployed) if path not in manifest]
+        sent = 0
+        for path in changed:
+            with open(os.path.join(out_dir, path), 'rb') as file:
+                data = file.read()
+            board.make_dirs(path)
+            board.write_file(path, data)
+            sent += len(data)
+        # The Pico imports a .py ahead of a .mpy, so any source copied over in the past, such as by hand, is
+        # removed for every module. Those aren't in the manifest, so are checked for on every deploy.
+        shadows = [path[:-4] + '.py' for path in sorted(manifest) if path.endswith('.mpy')]
+        board.remove(removed + shadows)
+
+        # The manifest goes last, so if a deploy is interrupted the files not yet sent are still seen as changed
+        board.write_file('manifest.json', json.dumps(manifest).encode())
+        board.reset()
+    finally:
+        serial.close()
+
+    log(name, '{} of {} files changed, {} removed, {} bytes sent in {:.1f}s'.format(
+        len(changed), len(manifest), len(removed), sent, time.monotonic() - started))
+
+
+def main(targets):
+    builds = []
+    for target in targets:
+        device, _, port = target.partition('=')
+        out_dir, manifest = build.build(device)
+        builds.append((os.path.basename(out_dir), out_dir, manifest, port or default_port))
+
+    failed = False
+    with ThreadPoolExecutor(len(builds)) as executor:
+        futures = [(name, executor.submit(deploy, name, out_dir, manifest, port))
+                   for name, out_dir, manifest, port in builds]
+        for name, future in futures:
+            try:
+                future.result()
+            except Exception as err:
+                log(name, 'deploy failed: {}'.format(err))
+                failed = True
+    return not failed
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    sys.exit(0 if main(sys.argv[1:]) else 1)
@@ -0,0 +1,132 @@
+"""
+A stand-in for a Pico's USB serial connection, for trying out tools/deploy.py without a board.
+Acts like the MicroPython raw REPL (including paste mode), running the code it's sent with this machine's
+Python, with the board's files kept in a folder here instead. Only the parts of os & machine used by
+deploys are provided.
+
+Usage: python3 tools/deploy.py picow_a=fake:/tmp/picow_a
+"""
+
+import binascii
+import builtins
+import os
+import struct
+import traceback
+from types import SimpleNamespace
+
+window = 256
+raw_prompt = b'raw REPL; CTRL-B to exit\r\n>'
+
+
+class FakeBoardSerial:
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        os.makedirs(self.folder, exist_ok=True)
+        self.resets = 0
+        self._output = bytearray()
+        self._input = bytearray()
+        self._mode = 'friendly'
+        self._pasted = 0
+        self._soft_reset()
+
+    @property
+    def in_waiting(self):
+        return len(self._output)
+
+    def read(self, count=1):
+        data = bytes(self._output[:count])
+        del self._output[:count]
+        return data
+
+    def reset_input_buffer(self):
+        self._output.clear()
+
+    def close(self):
+        pass
+
+    def write(self, data):
+        for byte in data:
+            self._receive(bytes([byte]))
+        return len(data)
+
+    def _receive(self, char):
+        if self._mode == 'friendly':
+            if char == b'\x01':
+                self._mode = 'raw'
+                self._input.clear()
+                self._output += raw_prompt
+        elif self._mode == 'raw':
+            if char == b'\x02':
+                self._mode = 'friendly'
+            elif char == b'\x04' and not self._input:
+                self._soft_reset()
+                self._output += b'soft reboot\r\n' + raw_prompt
+            elif char == b'\x04':
+                self._output += b'OK'
+                self._run()
+            else:
+                self._input += char
+                if self._input == b'\x05A\x01':
+                    self._mode = 'paste'
+                    self._input.clear()
+                    self._pasted = 0
+                    self._output += b'R\x01' + struct.pack('<H', window)
+        elif self._mode == 'paste':
+            if char == b'\x04':
+                self._output += b'\x04'
+                self._mode = 'raw'
+                self._run()
+            else:
+                self._input += char
+                self._pasted += 1
+                if self._pasted % window == 0:
+                    self._output += b'\x01'
+
+    def _run(self):
+        code = self._input.decode()
+        self._input.clear()
+        output = []
+        error = b''
+        self._globals['__builtins__']['print'] = lambda *args, **kwargs: output.append(
+            kwargs.get('sep', ' ').join(str(arg) for arg in args) + kwargs.get('end', '\n'))
+        try:
+            exec(code, self._globals)
+        except Exception as err:
+            error = ('Traceback (most recent call last):\r\n' +
+                     ''.join(traceback.format_exception_only(type(err), err))).encode()
+        self._output += ''.join(output).encode() + b'\x04' + error + b'\x04' + b'>'
+
+    def _soft_reset(self):
+        modules = {
+            'binascii': binascii,
+            'os': SimpleNamespace(
+                mkdir=lambda path: os.mkdir(self._path(path)),
+                remove=lambda path: os.remove(self._path(path)),
+                rename=lambda old, new: os.rename(self._path(old), self._path(new)),
+                listdir=lambda path='': os.listdir(self._path(path)),
+            ),
+            'machine': SimpleNamespace(reset=self._reset),
+        }
+
+        def _import(name, *args):
+            if name not in modules:
+                raise ImportError("no module named '{}'".format(name))
+            return modules[name]
+
+        board_builtins = dict(builtins.__dict__)
+        board_builtins['__import__'] = _import
+        board_builtins['open'] = lambda path, mode='r': open(self._path(path), mode)
+        self._globals = {'__builtins__': board_builtins}
+
+    def _reset(self):
+        self.resets += 1
+        self._mode = 'friendly'
+        self._soft_reset()
+
+    def _path(self, path):
+        # Board paths are relative to the root of its filesystem, so kept within the folder
+        full = os.path.abspath(os.path.join(self.folder, path.lstrip('/')))
+        if full != self.folder and not full.startswith(self.folder + os.sep):
+            raise OSError(2, 'ENOENT')
+        return full